@@ -0,0 +1,256 @@
+import asyncio
+import inspect
+from token_types import TokenType
+from operators import BINARY_OPERATORS, ASSIGN_OPERATORS
+from custom_builtins import builtin_functions
+from interpreter import Interpreter, UNBOUND
+from modules import module_cache
+from string_builder import StringBuilder
+from parse import BinOp, UnaryOp, Var, Num, String, Array, CallArray, Assign, CallFunction, CallMethod, walk
+
+# loop body statements run between two yields to the event loop
+DEFAULT_YIELD_EVERY = 100
+
+# nodes which are evaluated synchronously if they don't call anything
+SYNC_NODES = (BinOp, UnaryOp, Var, Num, String, Array, CallArray, Assign)
+
+
+def _is_sync(node):
+    return isinstance(node, SYNC_NODES) and not any(isinstance(child, (CallFunction, CallMethod)) for child in walk(node))
+
+
+# Interpreter running a program as a coroutine, host builtins may be coroutine functions
+# and loops give control back to the event loop every yield_every statements
+class AsyncInterpreter(Interpreter):
+
+    def __init__(self, parser=None, builtins=None, yield_every=DEFAULT_YIELD_EVERY):
+        super().__init__(parser, builtins=builtins)
+        self.yield_every = yield_every
+        self._ticks = 0
+
+        # synchronous interpreter sharing the frames, for nodes which can't suspend
+        self._evaluator = Interpreter()
+        self._evaluator.global_frame = self.global_frame
+        # id of node -> whether it is evaluated synchronously
+        self._sync = {}
+
+    async def visit(self, node):
+        sync = self._sync.get(id(node))
+        if sync is None:
+            sync = self._sync[id(node)] = _is_sync(node)
+        if sync:
+            self._evaluator.frame = self.frame
+            return self._evaluator.visit(node)
+
+        method_name = "visit_" + type(node).__name__
+        visitor = getattr(self, method_name, None)
+        if visitor is None:
+            visitor = self.fallback_visitor(node)
+        return await visitor(node)
+
+    # count a loop body statement, yield to the event loop when the slice is used up
+    async def _tick(self):
+        self._ticks += 1
+        if self._ticks >= self.yield_every:
+            self._ticks = 0
+            await asyncio.sleep(0)
+
+    async def _block(self, children):
+        for child in children:
+            await self.visit(child)
+
+    async def _loop_body(self, children):
+        for child in children:
+            await self.visit(child)
+            await self._tick()
+
+    async def _arguments(self, parameters):
+        arguments = []
+        for child in parameters:
+            arguments.append(await self.visit(child))
+        return arguments
+
+    async def _call(self, function, arguments):
+        result = function(*arguments)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def visit_BinOp(self, node):
+        left = await self.visit(node.left)
+        right = await self.visit(node.right)
+        return BINARY_OPERATORS[node.op](left, right)
+
+    async def visit_TypedBinOp(self, node):
+        left = await self.visit(node.left)
+        right = await self.visit(node.right)
+        return BINARY_OPERATORS[node.op](left, right)
+
+    async def visit_Num(self, node):
+        return node.value
+
+    async def visit_String(self, node):
+        return node.value
+
+    async def visit_NoneType(self, node):
+        return None
+
+    async def visit_Var(self, node):
+        return super().visit_Var(node)
+
+    async def visit_CallArray(self, node):
+        array = self._load(self.global_frame, node.slot)
+        if array is UNBOUND:
+            self._unbound(node.name)
+        return array[int(await self.visit(node.index))]
+
+    async def visit_IntCallArray(self, node):
+        array = self._load(self.global_frame, node.slot)
+        if array is UNBOUND:
+            self._unbound(node.name)
+        return array[await self.visit(node.index)]
+
+    async def visit_Array(self, node):
+        return await self._arguments(node.children)
+
+    async def visit_UnaryOp(self, node):
+        value = await self.visit(node.expression)
+        if node.op == TokenType.PLUS:
+            return +value
+        if node.op == TokenType.MINUS:
+            return -value
+
+    async def visit_If(self, node):
+        condition = await self.visit(node.comparison) if node.comparison is not None else True
+        if condition:
+            await self._block(node.children)
+        return condition
+
+    async def visit_CallFunction(self, node):
+        arguments = await self._arguments(node.parameters)
+        if node.name in self.host_builtins:
+            return await self._call(self.host_builtins[node.name], arguments)
+        elif node.name in globals()["__builtins__"]:
+            return globals()["__builtins__"][node.name](*arguments)
+        elif node.name in builtin_functions:
+            return builtin_functions[node.name](*arguments)
+        else:
+            func = self.functions[node.name]
+            frame = [UNBOUND] * func.frame_size
+            for index in range(len(func.parameters)):
+                frame[index] = arguments[index]
+
+            caller, self.frame = self.frame, frame
+            await self._block(func.children)
+            return_value = await self.visit(func.return_statement)
+            self.frame = caller
+
+            return return_value
+
+    async def visit_CallMethod(self, node):
+        method_called = node.method_called
+        arguments = await self._arguments(method_called.parameters)
+        receiver = await self.visit(node.object_called)
+        return await self._call(getattr(receiver, method_called.name), arguments)
+
+    async def visit_Repeat(self, node):
+        for i in range(int(await self.visit(node.count))):
+            await self._loop_body(node.children)
+
+    async def visit_IntRepeat(self, node):
+        for i in range(await self.visit(node.count)):
+            await self._loop_body(node.children)
+
+    async def visit_Each(self, node):
+        iterable = await self.visit(node.iterable)
+        slot = node.iterator.slot
+        for i in iterable:
+            self.frame[slot] = i
+            await self._loop_body(node.children)
+        if self.frame[slot] is UNBOUND:
+            self._unbound(node.iterator.value)
+        self.frame[slot] = UNBOUND
+
+    # host builtins may only be called from this process, so the iterations run one after another
+    async def visit_ParallelEach(self, node):
+        iterable = await self.visit(node.iterable)
+        slot = node.iterator.slot
+        outer, self.collected = self.collected, []
+        for i in iterable:
+            self.frame[slot] = i
+            await self._loop_body(node.children)
+        self.frame[slot] = UNBOUND
+        collected, self.collected = self.collected, outer
+        if node.target is not None:
+            self.frame[node.target.slot] = collected
+
+    async def visit_Collect(self, node):
+        self.collected.append(await self.visit(node.expression))
+
+    async def visit_While(self, node):
+        while await self.visit(node.comparison):
+            await self._loop_body(node.children)
+
+    async def visit_DefineFunction(self, node):
+        super().visit_DefineFunction(node)
+
+    async def visit_Import(self, node):
+        for func in module_cache.functions(node.path):
+            await self.visit_DefineFunction(func)
+
+    async def visit_Conditional(self, node):
+        for case in node.cases:
+            if await self.visit(case):
+                break
+        else:
+            await self.visit(node.else_case)
+
+    async def visit_Assign(self, node):
+        if node.op == TokenType.EQ:
+            value = await self.visit(node.right)
+        elif node.op == TokenType.PLUSPLUS:
+            value = await self.visit(node.left) + 1
+        elif node.op == TokenType.MINUSMINUS:
+            value = await self.visit(node.left) - 1
+        else:
+            left = await self.visit(node.left)
+            value = ASSIGN_OPERATORS[node.op](left, await self.visit(node.right))
+        self.frame[node.left.slot] = value
+
+    async def visit_TypedAssign(self, node):
+        slot = node.left.slot
+        value = self.frame[slot]
+        if value is UNBOUND:
+            self._unbound(node.left.value)
+        self.frame[slot] = ASSIGN_OPERATORS[node.op](value, await self.visit(node.right))
+
+    async def visit_AppendAssign(self, node):
+        slot = node.left.slot
+        if self.frame[slot] is UNBOUND:
+            self._unbound(node.left.value)
+        right = await self.visit(node.right if node.op == TokenType.PLUSEQ else node.right.right)
+        value = self.frame[slot]
+
+        if right.__class__ is str:
+            if value.__class__ is StringBuilder:
+                value.append(right)
+                return
+            if value.__class__ is str:
+                builder = self.frame[slot] = StringBuilder(value)
+                builder.append(right)
+                return
+        if value.__class__ is StringBuilder:
+            value = str(value)
+        self.frame[slot] = value + right
+
+    async def visit_Program(self, node):
+        await self._block(node.children)
+
+    # run the tree as a coroutine, parse it first if none is given
+    async def interpret(self, tree=None):
+        if tree is None:
+            tree = self.parser.parse()
+        self._sync.clear()
+        size = self.resolver.resolve(tree)
+        self.global_frame.extend([UNBOUND] * (size - len(self.global_frame)))
+        return await self.visit(tree)
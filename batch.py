@@ -0,0 +1,156 @@
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from lexer import Lexer
+from parse import Parser
+from optimizer import Optimizer, LEVELS
+
+
+# result of running a single script
+class ScriptResult:
+    def __init__(self, path, ok, stdout, error, seconds):
+        self.path = path
+        self.ok = ok
+        self.stdout = stdout
+        self.error = error
+        self.seconds = seconds
+
+
+# scripts of a directory or matching a glob pattern
+def collect_scripts(target):
+    if os.path.isdir(target):
+        pattern = os.path.join(target, "**", "*.crt")
+    else:
+        pattern = target
+    return sorted(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# runs once per worker process, scripts can't wait for a keyboard
+def _init_worker():
+    sys.stdin = open(os.devnull, "r")
+
+
+# parse and run one script with a fresh engine, all output and errors are captured
+def run_script(path, engine, optimize=0):
+    stdout = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with open(path, "r") as file:
+            source = file.read()
+        with contextlib.redirect_stdout(stdout):
+            tree = Parser(Lexer(source), os.path.dirname(path)).parse()
+            tree = Optimizer.for_level(optimize).optimize(tree)
+            engine().interpret(tree)
+    except BaseException as exception:
+        error = "".join(traceback.format_exception_only(type(exception), exception)).strip()
+        return ScriptResult(path, False, stdout.getvalue(), error, time.perf_counter() - start)
+    return ScriptResult(path, True, stdout.getvalue(), None, time.perf_counter() - start)
+
+
+# broken pools a script may be left unfinished in before it runs in a pool of its own
+MAX_BROKEN_POOLS = 2
+
+
+def _crashed(path, exception):
+    return ScriptResult(path, False, "", "worker crashed: " + str(exception), 0.0)
+
+
+# run the scripts at indexes on a fresh pool, returns the indexes left unfinished when the pool broke
+def _run_pool(paths, indexes, results, engine, optimize, workers):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [(index, executor.submit(run_script, paths[index], engine, optimize)) for index in indexes]
+        unfinished = []
+        for index, future in futures:
+            try:
+                results[index] = future.result()
+            except BrokenProcessPool:
+                unfinished.append(index)
+    return unfinished
+
+
+# a crash in a pool of its own can only come from the script itself
+def _run_alone(path, engine, optimize):
+    with ProcessPoolExecutor(max_workers=1, initializer=_init_worker) as executor:
+        try:
+            return executor.submit(run_script, path, engine, optimize).result()
+        except BrokenProcessPool as exception:
+            return _crashed(path, exception)
+
+
+# run all scripts on a process pool, results are returned in the order of paths.
+# a crashing worker breaks the whole pool, the scripts it left unfinished are run again on a
+# fresh pool and those which were unfinished in too many broken pools run in a pool of their own
+def run_batch(paths, engine, optimize=0, workers=None):
+    workers = workers or available_cores()
+    results = [None] * len(paths)
+    broken = [0] * len(paths)
+    pending = list(range(len(paths)))
+    suspects = []
+    while pending:
+        unfinished = _run_pool(paths, pending, results, engine, optimize, workers)
+        pending = []
+        for index in unfinished:
+            broken[index] += 1
+            (suspects if broken[index] >= MAX_BROKEN_POOLS else pending).append(index)
+    with ThreadPoolExecutor(max_workers=workers) as threads:
+        alone = threads.map(lambda index: _run_alone(paths[index], engine, optimize), suspects)
+        for index, result in zip(suspects, alone):
+            results[index] = result
+    return results
+
+
+def main(argv, engines):
+    arguments = argparse.ArgumentParser(prog="create.py batch", description="Run many create scripts in parallel.")
+    arguments.add_argument("target", help="directory or glob pattern of scripts")
+    arguments.add_argument("--engine", choices=engines, default="tree", help="execution engine (default: tree)")
+    arguments.add_argument("-O", type=int, choices=sorted(LEVELS), default=0, dest="optimize", help="optimization level")
+    arguments.add_argument("--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    arguments.add_argument("--output-dir", help="write the output of every script into this directory")
+    arguments.add_argument("--show-output", action="store_true", help="print the output of every script")
+    args = arguments.parse_args(argv)
+
+    paths = collect_scripts(args.target)
+    if not paths:
+        sys.exit("Error: No scripts found for " + args.target)
+
+    start = time.perf_counter()
+    results = run_batch(paths, engines[args.engine], args.optimize, args.workers)
+    elapsed = time.perf_counter() - start
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        root = os.path.commonpath([os.path.abspath(path) for path in paths])
+        if len(paths) == 1:
+            root = os.path.dirname(root)
+
+    failed = 0
+    for result in results:
+        status = "ok  " if result.ok else "FAIL"
+        print("{} {:8.3f}s {}".format(status, result.seconds, result.path))
+        if not result.ok:
+            failed += 1
+            print("     " + result.error)
+        if args.show_output and result.stdout:
+            print(result.stdout, end="" if result.stdout.endswith("\n") else "\n")
+        if args.output_dir:
+            name = os.path.splitext(os.path.relpath(os.path.abspath(result.path), root))[0].replace(os.sep, "_") + ".out"
+            with open(os.path.join(args.output_dir, name), "w") as file:
+                file.write(result.stdout)
+
+    print("{} scripts, {} failed, {:.3f}s, {:.1f} scripts/sec".format(
+        len(results), failed, elapsed, len(results) / elapsed if elapsed else 0.0))
+    return 1 if failed else 0
@@ -0,0 +1,73 @@
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from parse import Parser, AST
+
+# statements the generated program is made of
+SNIPPET = """var a = 1
+var b = 2.5
+var[] lst = [1, 2, 3]
+func add(x, y) {
+    var z = x + y * 2
+    return z
+}
+repeat 10 {
+    a = a + b * 2 - -b
+    lst.append(add(a, b))
+}
+if a >= 10 {
+    print("large number", a)
+}
+elseif a != 2 {
+    a += 1
+}
+"""
+
+
+# count all AST nodes reachable from node
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, AST):
+            count += 1
+            for name in dir(node):
+                if not name.startswith("__"):
+                    value = getattr(node, name, None)
+                    if isinstance(value, (AST, list)):
+                        stack.append(value)
+    return count
+
+
+def main():
+    arguments = argparse.ArgumentParser(description="Measure memory used by the AST.")
+    arguments.add_argument("--copies", type=int, default=2000, help="number of copies of the snippet")
+    args = arguments.parse_args()
+
+    source = SNIPPET * args.copies
+    lines = source.splitlines(keepends=True)
+
+    gc.collect()
+    tracemalloc.start()
+    tree = Parser(Lexer(lines)).parse()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nodes = count_nodes(tree)
+    print("nodes:          {}".format(nodes))
+    print("tree size:      {:.2f} MB".format(size / 1024 / 1024))
+    print("bytes per node: {:.1f}".format(size / nodes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from token_types import TokenType
+
+# statements the generated script is made of
+SNIPPET = """var lastnumber = 0
+var number = 1.5
+var[] lst = [1, 2, 3]
+# fibonacci step
+repeat 10 {
+    newnumber = lastnumber + number * 2
+    lastnumber = number
+    lst.append(number)
+}
+if number >= 10 {
+    print("large number", number)
+}
+elseif number != 2 {
+    number += 1
+}
+"""
+
+
+# script of at least size bytes
+def generate(size):
+    return SNIPPET * (size // len(SNIPPET) + 1)
+
+
+def lex(source):
+    lexer = Lexer(source)
+    count = 0
+    while lexer.get_token().type != TokenType.EOF:
+        count += 1
+    return count
+
+
+def main():
+    arguments = argparse.ArgumentParser(description="Measure lexing time and memory.")
+    arguments.add_argument("--size", type=int, default=1024 * 1024, help="size of the generated script in bytes")
+    arguments.add_argument("--runs", type=int, default=5)
+    args = arguments.parse_args()
+
+    source = generate(args.size)
+
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        count = lex(source)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+
+    tracemalloc.start()
+    lex(source)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("size:      {:.2f} MB".format(len(source) / 1024 / 1024))
+    print("tokens:    {}".format(count))
+    print("time:      {:.1f} ms ({:.2f} MB/s)".format(best * 1000, len(source) / best / 1024 / 1024))
+    print("peak mem:  {:.1f} MB".format(peak / 1024 / 1024))
+
+
+if __name__ == "__main__":
+    main()
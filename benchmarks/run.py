@@ -0,0 +1,178 @@
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from parse import Parser
+from optimizer import Optimizer, LEVELS
+from token_types import TokenType
+from interpreter import Interpreter
+from vm import VirtualMachine
+from closures import ClosureInterpreter
+from transpiler import PythonInterpreter
+
+PROGRAMS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "programs")
+
+ENGINES = {
+    "tree": Interpreter,
+    "vm": VirtualMachine,
+    "closure": ClosureInterpreter,
+    "python": PythonInterpreter,
+}
+
+PHASES = ("lex", "parse", "execute")
+
+# a phase is a regression when it got slower by more than this fraction
+DEFAULT_THRESHOLD = 0.10
+# changes smaller than this many seconds are noise, even if they are large relative to the time
+MIN_DELTA = 0.001
+
+
+# hands out already lexed tokens, so parsing is timed without lexing
+class TokenReplay:
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.eof = tokens[-1]
+
+    def get_token(self):
+        return next(self.tokens, self.eof)
+
+
+def lex(source):
+    lexer = Lexer(source)
+    tokens = [lexer.get_token()]
+    while tokens[-1].type != TokenType.EOF:
+        tokens.append(lexer.get_token())
+    return tokens
+
+
+def parse(tokens, optimize):
+    tree = Parser(TokenReplay(tokens)).parse()
+    return Optimizer.for_level(optimize).optimize(tree)
+
+
+# run the tree, returns the printed output
+def execute(tree, engine):
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        engine().interpret(tree)
+    return stdout.getvalue()
+
+
+def _timed(function, *arguments):
+    start = time.perf_counter()
+    result = function(*arguments)
+    return time.perf_counter() - start, result
+
+
+# median time of every phase, the execute phase gets a freshly parsed tree every run
+def run_program(path, engine, optimize, runs):
+    with open(path, "r") as file:
+        source = file.read()
+
+    timings = {phase: [] for phase in PHASES}
+    output = ""
+    for _ in range(runs):
+        seconds, tokens = _timed(lex, source)
+        timings["lex"].append(seconds)
+        seconds, tree = _timed(parse, tokens, optimize)
+        timings["parse"].append(seconds)
+        seconds, output = _timed(execute, tree, engine)
+        timings["execute"].append(seconds)
+
+    tracemalloc.start()
+    execute(parse(lex(source), optimize), engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {phase: statistics.median(timings[phase]) for phase in PHASES}
+    result["total"] = sum(result[phase] for phase in PHASES)
+    result["runs_per_sec"] = 1 / result["total"] if result["total"] else 0.0
+    result["peak_memory"] = peak
+    result["output_md5"] = hashlib.md5(output.encode()).hexdigest()
+    return result
+
+
+def run_suite(paths, engine_name, optimize, runs):
+    results = {}
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        results[name] = run_program(path, ENGINES[engine_name], optimize, runs)
+        print("{:<16} {:>9.1f} ms  {:>8.2f} runs/sec  {:>8.1f} MB".format(
+            name, results[name]["total"] * 1000, results[name]["runs_per_sec"], results[name]["peak_memory"] / 1024 / 1024),
+            file=sys.stderr)
+    return {
+        "engine": engine_name,
+        "optimize": optimize,
+        "runs": runs,
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+# print the change of every phase, returns the number of regressions
+def compare(old, new, threshold):
+    regressions = 0
+    print("{:<16} {:<8} {:>10} {:>10} {:>8}".format("program", "phase", "old ms", "new ms", "change"))
+    for name, result in sorted(new["results"].items()):
+        if name not in old["results"]:
+            continue
+        before = old["results"][name]
+        for phase in PHASES + ("total",):
+            change = result[phase] / before[phase] - 1 if before[phase] else 0.0
+            flag = ""
+            if change > threshold and result[phase] - before[phase] > MIN_DELTA:
+                flag = "  REGRESSION"
+                regressions += 1
+            print("{:<16} {:<8} {:>10.2f} {:>10.2f} {:>+7.1f}%{}".format(
+                name, phase, before[phase] * 1000, result[phase] * 1000, change * 100, flag))
+        if before["output_md5"] != result["output_md5"]:
+            print("{:<16} output changed".format(name))
+            regressions += 1
+    return regressions
+
+
+def main():
+    arguments = argparse.ArgumentParser(description="Run the benchmark programs or compare two result files.")
+    arguments.add_argument("programs", nargs="*", help="programs to run (default: all of benchmarks/programs)")
+    arguments.add_argument("--engine", choices=ENGINES, default="tree", help="execution engine (default: tree)")
+    arguments.add_argument("-O", type=int, choices=sorted(LEVELS), default=0, dest="optimize", help="optimization level")
+    arguments.add_argument("--runs", type=int, default=5, help="runs of every program, the median is reported")
+    arguments.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    arguments.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    arguments.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                           help="slowdown counted as regression (default: 0.10)")
+    args = arguments.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], "r") as file:
+            old = json.load(file)
+        with open(args.compare[1], "r") as file:
+            new = json.load(file)
+        regressions = compare(old, new, args.threshold)
+        print("{} regressions".format(regressions))
+        sys.exit(1 if regressions else 0)
+
+    paths = args.programs or sorted(glob.glob(os.path.join(PROGRAMS, "*.crt")))
+    suite = run_suite(paths, args.engine, args.optimize, args.runs)
+    text = json.dumps(suite, indent=2) + "\n"
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        sys.stdout.write(text)
+
+
+if __name__ == "__main__":
+    main()
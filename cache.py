@@ -0,0 +1,129 @@
+import hashlib
+import os
+import pickle
+import struct
+import tempfile
+
+CACHE_DIRECTORY = "__crtcache__"
+CACHE_SUFFIX = ".crtc"
+
+# bump when the lexer, the parser or the AST classes change
+INTERPRETER_VERSION = "11"
+
+# header of every entry: magic, format version, source key
+MAGIC = b"CRTC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sH32s")
+
+# total size of all entries before the least recently used get evicted
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+# On-disk cache of parsed programs keyed by a hash of their source
+class ProgramCache:
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+    # cache next to the source file, like __pycache__
+    @classmethod
+    def for_source(cls, path, max_size=DEFAULT_MAX_SIZE):
+        return cls(os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRECTORY), max_size)
+
+    # hash of the source, the interpreter version and everything else the entry depends on
+    def key(self, source, flavor=""):
+        digest = hashlib.sha256()
+        for part in (INTERPRETER_VERSION, flavor, source):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.digest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key.hex() + CACHE_SUFFIX)
+
+    # return the cached tree or None if there is no valid entry
+    def load(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+
+        try:
+            magic, version, entry_key = HEADER.unpack_from(data)
+            if magic != MAGIC or version != FORMAT_VERSION or entry_key != key:
+                raise ValueError("stale cache entry")
+            tree = pickle.loads(data[HEADER.size:])
+        except Exception:
+            self.invalidate(key)
+            return None
+
+        # mark as recently used for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return tree
+
+    # write atomically, readers see either the old entry or the complete new one
+    def store(self, key, tree):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            payload = pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL)
+        except (OSError, RecursionError, pickle.PicklingError):
+            return False
+
+        temporary = None
+        try:
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(HEADER.pack(MAGIC, FORMAT_VERSION, key))
+                file.write(payload)
+            os.replace(temporary, self._path(key))
+        except OSError:
+            # a read-only or full cache directory only costs the next run a parse
+            if temporary is not None:
+                try:
+                    os.unlink(temporary)
+                except OSError:
+                    pass
+            return False
+
+        self.evict()
+        return True
+
+    def invalidate(self, key):
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    # remove least recently used entries until the cache fits into max_size
+    def evict(self):
+        entries = []
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(CACHE_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(CACHE_SUFFIX):
+                    os.unlink(entry.path)
+        except OSError:
+            pass
@@ -0,0 +1,74 @@
+import json
+import os
+import socket
+import struct
+import sys
+
+# thin client of create.py serve, it only imports what talking to the socket needs
+# so starting it costs little more than starting python
+
+# every frame is a kind and the length of the payload which follows
+FRAME = struct.Struct(">cI")
+
+REQUEST = b"R"
+OUTPUT = b"O"
+ERROR = b"E"
+EXIT = b"X"
+
+USAGE = "usage: client.py --socket PATH [--stdin] script.crt"
+
+
+def send_frame(connection, kind, payload):
+    connection.sendall(FRAME.pack(kind, len(payload)) + payload)
+
+
+def _receive_exactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise EOFError("connection closed")
+        data += chunk
+    return bytes(data)
+
+
+# returns (kind, payload), raises EOFError when the other side closed the connection
+def receive_frame(connection):
+    kind, size = FRAME.unpack(_receive_exactly(connection, FRAME.size))
+    return kind, _receive_exactly(connection, size)
+
+
+# run the script in the daemon, the output is written to stdout and stderr while it arrives,
+# returns the exit status of the script
+def run(socket_path, script, stdin="", stdout=sys.stdout, stderr=sys.stderr):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        request = {"path": os.path.abspath(script), "stdin": stdin}
+        send_frame(connection, REQUEST, json.dumps(request).encode("utf-8"))
+        while True:
+            kind, payload = receive_frame(connection)
+            if kind == OUTPUT:
+                stdout.write(payload.decode("utf-8"))
+            elif kind == ERROR:
+                stderr.write(payload.decode("utf-8") + "\n")
+            elif kind == EXIT:
+                stdout.flush()
+                return int(payload)
+
+
+# the script only gets stdin with --stdin, reading it otherwise would wait for
+# the end of an inherited pipe or terminal which never sends anything
+def main(argv):
+    send_stdin = "--stdin" in argv
+    argv = [argument for argument in argv if argument != "--stdin"]
+    if len(argv) != 3 or argv[0] != "--socket":
+        sys.exit(USAGE)
+    stdin = sys.stdin.read() if send_stdin and sys.stdin is not None else ""
+    try:
+        return run(argv[1], argv[2], stdin)
+    except (OSError, EOFError) as exception:
+        sys.exit("Error: talking to the daemon at {} failed: {}".format(argv[1], exception))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,256 @@
+import builtins
+from token_types import TokenType
+from operators import BINARY_OPERATORS, ASSIGN_OPERATORS
+from interpreter import NodeVisitor
+from custom_builtins import builtin_functions
+from modules import module_cache
+
+
+# user function compiled to closures
+class Function:
+    def __init__(self, name, parameters, body, return_value):
+        self.name = name
+        self.parameters = parameters
+        self.body = body
+        self.return_value = return_value
+
+
+# Compiler turning every AST node into a python closure taking the current scope
+class ClosureCompiler(NodeVisitor):
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        # targets of the peach loops around the statement being compiled
+        self.peach_targets = []
+
+    def compile(self, tree):
+        return self.visit(tree)
+
+    def _block(self, children):
+        return tuple(self.visit(child) for child in children)
+
+    def visit_Program(self, node):
+        body = self._block(node.children)
+
+        def program(scope):
+            for statement in body:
+                statement(scope)
+        return program
+
+    def visit_Num(self, node):
+        value = node.value
+        return lambda scope: value
+
+    def visit_String(self, node):
+        value = node.value
+        return lambda scope: value
+
+    def visit_Var(self, node):
+        name = node.value
+        return lambda scope: scope[name]
+
+    def visit_Array(self, node):
+        elements = self._block(node.children)
+        return lambda scope: [element(scope) for element in elements]
+
+    def visit_CallArray(self, node):
+        global_scope = self.interpreter.globals
+        name = node.name
+        index = self.visit(node.index)
+        return lambda scope: global_scope[name][int(index(scope))]
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        op = node.op
+        if op == TokenType.PLUS:
+            return lambda scope: left(scope) + right(scope)
+        elif op == TokenType.MINUS:
+            return lambda scope: left(scope) - right(scope)
+        elif op == TokenType.ASTERISK:
+            return lambda scope: left(scope) * right(scope)
+        elif op == TokenType.SLASH:
+            return lambda scope: left(scope) / right(scope)
+        elif op == TokenType.LT:
+            return lambda scope: left(scope) < right(scope)
+        elif op == TokenType.GT:
+            return lambda scope: left(scope) > right(scope)
+        elif op == TokenType.EQEQ:
+            return lambda scope: left(scope) == right(scope)
+        function = BINARY_OPERATORS[op]
+        return lambda scope: function(left(scope), right(scope))
+
+    def visit_UnaryOp(self, node):
+        expression = self.visit(node.expression)
+        if node.op == TokenType.MINUS:
+            return lambda scope: -expression(scope)
+        return lambda scope: +expression(scope)
+
+    def _arguments(self, parameters):
+        arguments = self._block(parameters)
+        if len(arguments) == 0:
+            return lambda scope: ()
+        elif len(arguments) == 1:
+            first, = arguments
+            return lambda scope: (first(scope),)
+        elif len(arguments) == 2:
+            first, second = arguments
+            return lambda scope: (first(scope), second(scope))
+        return lambda scope: [argument(scope) for argument in arguments]
+
+    def visit_CallFunction(self, node):
+        name = node.name
+        arguments = self._arguments(node.parameters)
+
+        # builtins always take precedence, so they are bound once
+        if name in builtins.__dict__ or name in builtin_functions:
+            function = builtins.__dict__[name] if name in builtins.__dict__ else builtin_functions[name]
+            return lambda scope: function(*arguments(scope))
+
+        functions = self.interpreter.functions
+
+        def call(scope):
+            values = arguments(scope)
+            function = functions[name]
+            if len(values) < len(function.parameters):
+                raise Exception("Function " + name + " expects " + str(len(function.parameters)) + " arguments")
+            local_scope = dict(zip(function.parameters, values))
+            for statement in function.body:
+                statement(local_scope)
+            return function.return_value(local_scope)
+        return call
+
+    def visit_CallMethod(self, node):
+        object_name = node.object_called.value
+        method_name = node.method_called.name
+        arguments = self._arguments(node.method_called.parameters)
+        return lambda scope: getattr(scope[object_name], method_name)(*arguments(scope))
+
+    def visit_Assign(self, node):
+        name = node.left.value
+        op = node.op
+        if op == TokenType.EQ:
+            value = self.visit(node.right)
+
+            def assign(scope):
+                scope[name] = value(scope)
+        elif op == TokenType.PLUSPLUS:
+            def assign(scope):
+                scope[name] = scope[name] + 1
+        elif op == TokenType.MINUSMINUS:
+            def assign(scope):
+                scope[name] = scope[name] - 1
+        else:
+            function = ASSIGN_OPERATORS[op]
+            value = self.visit(node.right)
+
+            def assign(scope):
+                scope[name] = function(scope[name], value(scope))
+        return assign
+
+    def visit_Conditional(self, node):
+        cases = tuple((self.visit(case.comparison), self._block(case.children)) for case in node.cases)
+        else_body = self._block(node.else_case.children) if node.else_case is not None else ()
+
+        def conditional(scope):
+            for comparison, body in cases:
+                if comparison(scope):
+                    break
+            else:
+                body = else_body
+            for statement in body:
+                statement(scope)
+        return conditional
+
+    def visit_While(self, node):
+        comparison = self.visit(node.comparison)
+        body = self._block(node.children)
+
+        def loop(scope):
+            while comparison(scope):
+                for statement in body:
+                    statement(scope)
+        return loop
+
+    def visit_Repeat(self, node):
+        count = self.visit(node.count)
+        body = self._block(node.children)
+
+        def repeat(scope):
+            for i in range(int(count(scope))):
+                for statement in body:
+                    statement(scope)
+        return repeat
+
+    def visit_Each(self, node):
+        name = node.iterator.value
+        iterable = self.visit(node.iterable)
+        body = self._block(node.children)
+
+        def each(scope):
+            for value in iterable(scope):
+                scope[name] = value
+                for statement in body:
+                    statement(scope)
+            del scope[name]
+        return each
+
+    # the iterations of peach run one after another, collect appends to the target
+    def visit_ParallelEach(self, node):
+        name = node.iterator.value
+        target = node.target.value if node.target is not None else None
+        iterable = self.visit(node.iterable)
+        self.peach_targets.append(target)
+        body = self._block(node.children)
+        self.peach_targets.pop()
+
+        def peach(scope):
+            values = iterable(scope)
+            if target is not None:
+                scope[target] = []
+            for value in values:
+                scope[name] = value
+                for statement in body:
+                    statement(scope)
+            scope.pop(name, None)
+        return peach
+
+    def visit_Collect(self, node):
+        target = self.peach_targets[-1]
+        expression = self.visit(node.expression)
+        return lambda scope: scope[target].append(expression(scope))
+
+    def visit_Import(self, node):
+        definitions = self._block(module_cache.functions(node.path))
+
+        def bind(scope):
+            for define in definitions:
+                define(scope)
+        return bind
+
+    def visit_DefineFunction(self, node):
+        functions = self.interpreter.functions
+        name = node.name.text
+        parameters = tuple(parameter.text for parameter in node.parameters)
+        body = self._block(node.children)
+        return_value = self.visit(node.return_statement) if node.return_statement is not None else lambda scope: None
+        function = Function(name, parameters, body, return_value)
+
+        def define(scope):
+            functions[name] = function
+        return define
+
+
+# Interpreter running the program as a single call of the compiled root closure
+class ClosureInterpreter:
+    def __init__(self, parser=None):
+        self.parser = parser
+
+        self.globals = {}
+        self.functions = {}
+
+    # run the tree, parse it first if none is given
+    def interpret(self, tree=None):
+        if tree is None:
+            tree = self.parser.parse()
+        program = ClosureCompiler(self).compile(tree)
+        return program(self.globals)
@@ -0,0 +1,283 @@
+import operators
+from token_types import TokenType
+from interpreter import NodeVisitor
+from parse import CallFunction, CallMethod
+from modules import module_cache
+
+# opcodes of the stack vm, every instruction is followed by one argument
+LOAD_NAME = 0
+LOAD_CONST = 1
+STORE_NAME = 2
+BINARY_OP = 3
+POP_JUMP_IF_FALSE = 4
+JUMP = 5
+FOR_ITER = 6
+CALL_FUNCTION = 7
+CALL_METHOD = 8
+LOAD_INDEX = 9
+UNARY_OP = 10
+POP_TOP = 11
+GET_ITER = 12
+GET_RANGE = 13
+DELETE_NAME = 14
+BUILD_LIST = 15
+DEFINE_FUNCTION = 16
+RETURN_VALUE = 17
+FOR_REPEAT = 18
+TAIL_CALL = 19
+# jump out of a conditional, unlike JUMP it isn't a loop iteration and doesn't take a step
+JUMP_FORWARD = 20
+
+OPCODE_NAMES = {value: name for name, value in globals().items() if name.isupper() and isinstance(value, int)}
+
+# estimated size of a call frame and of every local variable in it
+FRAME_BYTES = 200
+SLOT_BYTES = 100
+
+# operators used by BINARY_OP, the argument is the index into this table
+BINARY_OPERATORS = list(operators.BINARY_OPERATORS.values())
+BINARY_OPS = {op: index for index, op in enumerate(operators.BINARY_OPERATORS)}
+
+# operators used by UNARY_OP
+UNARY_OPERATORS = list(operators.UNARY_OPERATORS.values())
+UNARY_OPS = {op: index for index, op in enumerate(operators.UNARY_OPERATORS)}
+
+# in-place assignments compile to load, binary op and store
+ASSIGN_OPS = {op: BINARY_OPS[binary] for op, binary in operators.COMPOUND_ASSIGN.items()}
+
+
+# compiled bytecode of the program or of a single function
+class CodeObject:
+    def __init__(self, name, parameters=()):
+        self.name = name
+        self.parameters = tuple(parameters)
+        self.code = []
+        self.consts = []
+        self.names = []
+        # (function or method name, argument count) of every call site
+        self.calls = []
+        # estimated memory of one frame, used for the call stack budget
+        self.frame_bytes = 0
+
+    def disassemble(self):
+        lines = []
+        for pc in range(0, len(self.code), 2):
+            op, arg = self.code[pc], self.code[pc + 1]
+            if op in {LOAD_NAME, STORE_NAME, DELETE_NAME, LOAD_INDEX}:
+                detail = self.names[arg]
+            elif op in {LOAD_CONST, DEFINE_FUNCTION}:
+                detail = repr(self.consts[arg])
+            elif op in {CALL_FUNCTION, TAIL_CALL, CALL_METHOD}:
+                detail = "{}/{}".format(*self.calls[arg])
+            else:
+                detail = ""
+            lines.append("{:>5} {:<18} {:>4} {}".format(pc, OPCODE_NAMES[op], arg, detail).rstrip())
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return "<code {}>".format(self.name)
+
+
+# Compiler turning the AST of the parser into bytecode
+class Compiler(NodeVisitor):
+    def __init__(self):
+        self.code_object = None
+        # targets of the peach loops around the statement being compiled
+        self.peach_targets = []
+
+    def compile(self, tree, name="<program>"):
+        self.code_object = CodeObject(name)
+        self.visit(tree)
+        self._emit(LOAD_CONST, self._const(None))
+        self._emit(RETURN_VALUE)
+        return self.code_object
+
+    def _emit(self, op, arg=0):
+        self.code_object.code.extend((op, arg))
+        return len(self.code_object.code) - 1
+
+    # position of the next instruction
+    def _label(self):
+        return len(self.code_object.code)
+
+    # set argument of an already emitted jump
+    def _patch(self, position, target):
+        self.code_object.code[position] = target
+
+    def _const(self, value):
+        consts = self.code_object.consts
+        for index, const in enumerate(consts):
+            if type(const) is type(value) and const == value:
+                return index
+        consts.append(value)
+        return len(consts) - 1
+
+    def _name(self, name):
+        names = self.code_object.names
+        if name not in names:
+            names.append(name)
+        return names.index(name)
+
+    def _call(self, name, count):
+        calls = self.code_object.calls
+        if (name, count) not in calls:
+            calls.append((name, count))
+        return calls.index((name, count))
+
+    def _block(self, children):
+        for child in children:
+            self.visit(child)
+
+    def visit_Program(self, node):
+        self._statements(node.children)
+
+    def visit_Num(self, node):
+        self._emit(LOAD_CONST, self._const(node.value))
+
+    def visit_String(self, node):
+        self._emit(LOAD_CONST, self._const(node.value))
+
+    def visit_Var(self, node):
+        self._emit(LOAD_NAME, self._name(node.value))
+
+    def visit_Array(self, node):
+        self._block(node.children)
+        self._emit(BUILD_LIST, len(node.children))
+
+    def visit_CallArray(self, node):
+        self.visit(node.index)
+        self._emit(LOAD_INDEX, self._name(node.name))
+
+    def visit_BinOp(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+        self._emit(BINARY_OP, BINARY_OPS[node.op])
+
+    def visit_UnaryOp(self, node):
+        self.visit(node.expression)
+        self._emit(UNARY_OP, UNARY_OPS[node.op])
+
+    def visit_CallFunction(self, node):
+        self._block(node.parameters)
+        self._emit(CALL_FUNCTION, self._call(node.name, len(node.parameters)))
+
+    def visit_CallMethod(self, node):
+        self._emit(LOAD_NAME, self._name(node.object_called.value))
+        self._block(node.method_called.parameters)
+        self._emit(CALL_METHOD, self._call(node.method_called.name, len(node.method_called.parameters)))
+
+    # statements leave nothing on the stack, expression statements are popped
+    def _statement(self, node):
+        self.visit(node)
+        if isinstance(node, (CallFunction, CallMethod)):
+            self._emit(POP_TOP)
+
+    def _statements(self, children):
+        for child in children:
+            self._statement(child)
+
+    def visit_Assign(self, node):
+        name = self._name(node.left.value)
+        op = node.op
+        if op == TokenType.EQ:
+            self.visit(node.right)
+        else:
+            self._emit(LOAD_NAME, name)
+            if op in {TokenType.PLUSPLUS, TokenType.MINUSMINUS}:
+                self._emit(LOAD_CONST, self._const(1))
+            else:
+                self.visit(node.right)
+            self._emit(BINARY_OP, ASSIGN_OPS[op])
+        self._emit(STORE_NAME, name)
+
+    def visit_Conditional(self, node):
+        exits = []
+        for case in node.cases:
+            self.visit(case.comparison)
+            skip = self._emit(POP_JUMP_IF_FALSE)
+            self._statements(case.children)
+            exits.append(self._emit(JUMP_FORWARD))
+            self._patch(skip, self._label())
+        if node.else_case is not None:
+            self._statements(node.else_case.children)
+        for position in exits:
+            self._patch(position, self._label())
+
+    def visit_While(self, node):
+        start = self._label()
+        self.visit(node.comparison)
+        exit = self._emit(POP_JUMP_IF_FALSE)
+        self._statements(node.children)
+        self._emit(JUMP, start)
+        self._patch(exit, self._label())
+
+    def visit_Repeat(self, node):
+        self.visit(node.count)
+        self._emit(GET_RANGE)
+        start = self._label()
+        exit = self._emit(FOR_REPEAT)
+        self._statements(node.children)
+        self._emit(JUMP, start)
+        self._patch(exit, self._label())
+
+    def visit_Each(self, node):
+        name = self._name(node.iterator.value)
+        self.visit(node.iterable)
+        self._emit(GET_ITER)
+        start = self._label()
+        exit = self._emit(FOR_ITER)
+        self._emit(STORE_NAME, name)
+        self._statements(node.children)
+        self._emit(JUMP, start)
+        self._patch(exit, self._label())
+        self._emit(DELETE_NAME, name)
+
+    # the vm runs the iterations of peach one after another, collect appends to the target
+    def visit_ParallelEach(self, node):
+        name = self._name(node.iterator.value)
+        target = node.target.value if node.target is not None else None
+        self.visit(node.iterable)
+        self._emit(GET_ITER)
+        if target is not None:
+            self._emit(BUILD_LIST, 0)
+            self._emit(STORE_NAME, self._name(target))
+        start = self._label()
+        exit = self._emit(FOR_ITER)
+        self._emit(STORE_NAME, name)
+        self.peach_targets.append(target)
+        self._statements(node.children)
+        self.peach_targets.pop()
+        self._emit(JUMP, start)
+        self._patch(exit, self._label())
+
+    def visit_Collect(self, node):
+        self._emit(LOAD_NAME, self._name(self.peach_targets[-1]))
+        self.visit(node.expression)
+        self._emit(CALL_METHOD, self._call("append", 1))
+        self._emit(POP_TOP)
+
+    # the functions of the module are compiled into the importing code
+    def visit_Import(self, node):
+        for func in module_cache.functions(node.path):
+            self.visit(func)
+
+    def visit_DefineFunction(self, node):
+        parameters = [parameter.text for parameter in node.parameters]
+        code_object = CodeObject(node.name.text, parameters)
+
+        outer, self.code_object = self.code_object, code_object
+        self._statements(node.children)
+        if isinstance(node.return_statement, CallFunction):
+            # a call in tail position replaces the frame of the function
+            call = node.return_statement
+            self._block(call.parameters)
+            self._emit(TAIL_CALL, self._call(call.name, len(call.parameters)))
+        elif node.return_statement is not None:
+            self.visit(node.return_statement)
+        else:
+            self._emit(LOAD_CONST, self._const(None))
+        self._emit(RETURN_VALUE)
+        code_object.frame_bytes = FRAME_BYTES + SLOT_BYTES * len(code_object.names)
+        self.code_object = outer
+
+        self._emit(DEFINE_FUNCTION, self._const(code_object))
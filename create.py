@@ -1,24 +1,192 @@
 from lexer import Lexer
-from parse import Parser
-import sys
+from parse import Parser, Program
+import argparse
 from interpreter import Interpreter
+from vm import VirtualMachine
+from closures import ClosureInterpreter
+from transpiler import Transpiler, PythonInterpreter
+from cache import ProgramCache
+from optimizer import Optimizer, PASSES, LEVELS
+from parse import DefineFunction
+import os
+import sys
+import threading
+import time
 
 
 # http://web.eecs.utk.edu/~azh/blog/teenytinycompiler2.html
 # https://ruslanspivak.com/lsbasi-part9/
 
+# available execution engines, the tree walker is the reference
+ENGINES = {
+    "tree": Interpreter,
+    "vm": VirtualMachine,
+    "closure": ClosureInterpreter,
+    "python": PythonInterpreter,
+}
+
+STREAM_BUFFER_SIZE = 1024 * 1024
+
+# seconds between two checks of the source in watch mode
+WATCH_INTERVAL = 0.5
+
+
+# parse and optimize the source, reusing the tree of an earlier run if it is cached
+def load_program(path, source, use_cache=True, optimizer=None):
+    cache = ProgramCache.for_source(path) if use_cache else None
+    if cache is not None:
+        flavor = ",".join(sorted(optimizer.passes)) if optimizer is not None else ""
+        key = cache.key(source, flavor)
+        tree = cache.load(key)
+        if tree is not None:
+            return tree
+
+    # Initialize the lexer, emitter, and parser.
+    lexer = Lexer(source)
+    parser = Parser(lexer, os.path.dirname(path))
+    tree = parser.parse()
+    if optimizer is not None:
+        tree = optimizer.optimize(tree)
+
+    if cache is not None:
+        cache.store(key, tree)
+    return tree
+
+
+# run every top level statement as soon as it is parsed, memory only depends on the largest statement
+def run_stream(path, interpreter):
+    with open(path, 'r', buffering=STREAM_BUFFER_SIZE) as inputFile:
+        parser = Parser(Lexer(inputFile), os.path.dirname(path))
+        for statement in parser.statements():
+            program = Program()
+            program.children.append(statement)
+            interpreter.interpret(program)
+
+
+# reparse the source whenever it changes and swap changed functions into the running interpreter
+def watch(path, parser, interpreter):
+    mtime = os.stat(path).st_mtime
+    while True:
+        time.sleep(WATCH_INTERVAL)
+        try:
+            if os.stat(path).st_mtime == mtime:
+                continue
+            mtime = os.stat(path).st_mtime
+            with open(path, 'r') as inputFile:
+                source = inputFile.read()
+            start = time.perf_counter()
+            parser.parse(source)
+        except Exception as exception:
+            print("watch: " + str(exception), file=sys.stderr)
+            continue
+
+        for statement in parser.changed:
+            if isinstance(statement, DefineFunction):
+                interpreter.reload_function(statement)
+                print("watch: reloaded " + statement.name.text, file=sys.stderr)
+            else:
+                print("watch: line {} changed, restart to run it".format(statement.line), file=sys.stderr)
+        print("watch: {:.1f} ms".format((time.perf_counter() - start) * 1000), file=sys.stderr)
+
+
+# run the program while its functions are reloaded on every change of the source
+def run_watched(path, interpreter):
+    from incremental import IncrementalParser
+    parser = IncrementalParser(os.path.dirname(path))
+    with open(path, 'r') as inputFile:
+        tree = parser.parse(inputFile.read())
+    threading.Thread(target=watch, args=(path, parser, interpreter), daemon=True).start()
+    interpreter.interpret(tree)
+
+
+# the modules of the subcommands and of flags like --profile are imported when they are used,
+# they pull in multiprocessing and socketserver which would slow down the start of every run
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        import batch
+        sys.exit(batch.main(sys.argv[2:], ENGINES))
+    if len(sys.argv) > 1 and sys.argv[1] == "schedule":
+        import scheduler
+        sys.exit(scheduler.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        import serve
+        sys.exit(serve.main(sys.argv[2:]))
+
+    arguments = argparse.ArgumentParser(description="Run a create source file.")
+    arguments.add_argument("source", help="source file to run")
+    arguments.add_argument("--engine", choices=ENGINES, default="tree", help="execution engine (default: tree)")
+    arguments.add_argument("--emit-python", action="store_true", help="print the transpiled python source instead of running")
+    arguments.add_argument("--no-cache", action="store_true", help="always parse the source, don't use __crtcache__")
+    arguments.add_argument("--stream", action="store_true", help="execute statements while the source is read, for very large scripts")
+    arguments.add_argument("-O", type=int, choices=LEVELS, default=0, dest="optimize", help="optimization level (default: 0)")
+    arguments.add_argument("--disable-pass", action="append", choices=PASSES, default=[], help="turn off a single optimization pass")
+    arguments.add_argument("--stack-budget", type=int, help="memory budget of the vm call stack in MB")
+    arguments.add_argument("--memo-size", type=int, help="results kept per memoized function, 0 turns memoization off (tree engine)")
+    arguments.add_argument("--memo-stats", action="store_true", help="print hits and misses of memoized functions to stderr (tree engine)")
+    arguments.add_argument("--workers", type=int, help="processes running peach loops, 1 runs them in this process (tree engine)")
+    arguments.add_argument("--watch", action="store_true", help="reload changed functions while the program runs (tree engine)")
+    arguments.add_argument("--profile", action="store_true", help="print time and hits of every line and function to stderr (tree engine)")
+    arguments.add_argument("--profile-stacks", metavar="PATH", help="with --profile, write collapsed stacks for flame graph tools")
+    arguments.add_argument("--opt-stats", action="store_true", help="print what the optimizer changed to stderr")
+    args = arguments.parse_args()
 
-    if len(sys.argv) != 2:
-        sys.exit("Error: Compiler needs source file as argument.")
-    with open(sys.argv[1], 'r') as inputFile:
+    if args.stream:
+        run_stream(args.source, ENGINES[args.engine]())
+        return
+
+    if args.watch:
+        if args.engine != "tree":
+            sys.exit("Error: --watch needs --engine=tree")
+        run_watched(args.source, Interpreter())
+        return
+
+    with open(args.source, 'r') as inputFile:
         input = inputFile.read()
 
-    # Initialize the lexer, emitter, and parser.
-    lexer = Lexer(input)
-    parser = Parser(lexer)
-    interpreter = Interpreter(parser)
+    optimizer = Optimizer.for_level(args.optimize, args.disable_pass)
+    tree = load_program(args.source, input, not args.no_cache, optimizer)
+    if args.opt_stats:
+        if not optimizer.optimized:
+            print("optimizer: tree loaded from cache", file=sys.stderr)
+        else:
+            print("optimizer: " + (optimizer.report() or "off"), file=sys.stderr)
+
+    if args.emit_python:
+        print(Transpiler().transpile(tree, args.source), end="")
+        return
+
+    if args.profile and args.engine != "tree":
+        sys.exit("Error: --profile needs --engine=tree")
+    if args.profile:
+        from profiler import ProfilingInterpreter
+        interpreter = ProfilingInterpreter()
+    else:
+        interpreter = ENGINES[args.engine]()
+    if args.stack_budget is not None:
+        if args.engine != "vm":
+            sys.exit("Error: --stack-budget needs --engine=vm")
+        interpreter.memory_budget = args.stack_budget * 1024 * 1024
+    if (args.memo_size is not None or args.memo_stats) and args.engine != "tree":
+        sys.exit("Error: --memo-size and --memo-stats need --engine=tree")
+    if args.memo_size is not None:
+        interpreter.memo_size = args.memo_size
+    if args.workers is not None:
+        if args.engine != "tree":
+            sys.exit("Error: --workers needs --engine=tree")
+        interpreter.pool.workers = args.workers
+
+    try:
+        res = interpreter.interpret(tree)
+    finally:
+        if args.profile:
+            sys.stderr.write(interpreter.report(input.splitlines(), path=args.source))
+            if args.profile_stacks:
+                with open(args.profile_stacks, "w") as file:
+                    file.write(interpreter.collapsed_stacks())
 
-    res = interpreter.interpret()
+    if args.memo_stats:
+        for name, memo in interpreter.memo_stats().items():
+            print("memo: {}: {}".format(name, memo.report()), file=sys.stderr)
 
-main()
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import random
+from typed_array import typed, zeros, ones, arange, rdmarray
 
 
 def println(*x):
@@ -12,5 +13,10 @@ def rmd(x, y):
 
 builtin_functions = {
     "println": println,
-    "rdm": rmd
+    "rdm": rmd,
+    "typed": typed,
+    "zeros": zeros,
+    "ones": ones,
+    "arange": arange,
+    "rdmarray": rdmarray,
 }
@@ -0,0 +1,68 @@
+import functools
+from lexer import Lexer
+from parse import Parser
+from optimizer import Optimizer, SPECIALIZE
+from resolver import Resolver
+from interpreter import Interpreter, UNBOUND
+
+
+# API for host applications: compile a program once and run it many times,
+# the values a run works on are passed in instead of read with input()
+#
+#     program = embed.compile(source, inputs=("record",))
+#     for record in records:
+#         results = program.run(globals={"record": record}, stdout=out)
+
+
+def _println(stdout):
+    def println(*values):
+        for value in values:
+            print(value, file=stdout)
+    return println
+
+
+# parsed and resolved program, runs share the tree but every run has its own interpreter and globals
+class CompiledProgram:
+    def __init__(self, tree, resolver, inputs):
+        self.tree = tree
+        self.resolver = resolver
+        self.inputs = inputs
+
+    # run the program, globals sets global variables before the first statement,
+    # builtins are host functions taking precedence over all others and
+    # stdout is a file print writes to instead of sys.stdout, returns the globals after the run
+    def run(self, globals=None, builtins=None, stdout=None):
+        host_builtins = {}
+        if stdout is not None:
+            # a builtin of the run instead of redirecting sys.stdout, which other runs use as well
+            host_builtins["print"] = functools.partial(print, file=stdout)
+            host_builtins["println"] = _println(stdout)
+        host_builtins.update(builtins or {})
+
+        interpreter = Interpreter(builtins=host_builtins)
+        # runs only read the resolver, the tree was resolved by compile
+        interpreter.resolver = self.resolver
+        interpreter.global_frame.extend([UNBOUND] * len(self.resolver.globals))
+        for name, value in (globals or {}).items():
+            if name not in self.resolver.globals:
+                raise Exception("Setting unknown global variable: " + name)
+            interpreter.global_frame[self.resolver.globals[name]] = value
+
+        interpreter.execute(self.tree)
+        return interpreter.globals
+
+
+# parse, optimize and resolve the source, inputs are the names of the globals every run sets,
+# imports are relative to directory
+def compile(source, inputs=(), optimize=0, directory=None):
+    parser = Parser(Lexer(source), directory)
+    parser.symbols.update(inputs)
+    tree = parser.parse()
+    # the types of the inputs aren't known before a run
+    tree = Optimizer.for_level(optimize, (SPECIALIZE,) if inputs else ()).optimize(tree)
+
+    resolver = Resolver()
+    for name in inputs:
+        resolver.globals.setdefault(name, len(resolver.globals))
+    resolver.resolve(tree)
+    return CompiledProgram(tree, resolver, tuple(inputs))
@@ -0,0 +1,135 @@
+import re
+from lexer import Lexer
+from parse import Parser, Program, DefineFunction, walk
+
+# lines continuing the conditional of the line before
+CONTINUATION = re.compile(r"[ \t]*(?:elseif|else)(?![^\W\d_])")
+
+
+# change of { and } depth of a line, braces in strings and comments don't count
+def _brace_delta(line):
+    if '"' not in line and "#" not in line:
+        return line.count("{") - line.count("}")
+    delta = 0
+    in_string = False
+    for character in line:
+        if character == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif character == "#":
+            break
+        elif character == "{":
+            delta += 1
+        elif character == "}":
+            delta -= 1
+    return delta
+
+
+# split the source into the text of its top level statements, returns (first line, text) pairs,
+# blank lines and comments belong to the statement before them
+def split_statements(source):
+    chunks = []
+    lines = []
+    first = 1
+    depth = 0
+    for number, line in enumerate(source.splitlines(keepends=True), 1):
+        if depth == 0 and lines and line.strip() and not line.lstrip().startswith("#") \
+                and not CONTINUATION.match(line):
+            chunks.append((first, "".join(lines)))
+            lines = []
+        if not lines:
+            first = number
+        lines.append(line)
+        depth += _brace_delta(line)
+    if lines:
+        chunks.append((first, "".join(lines)))
+    return chunks
+
+
+# symbols of the parser of a single statement, names used before the statement declares them
+# are recorded and checked against the statements before it
+class _StatementSymbols(set):
+    def __init__(self):
+        super().__init__()
+        self.required = set()
+
+    def __contains__(self, name):
+        if not set.__contains__(self, name):
+            self.required.add(name)
+        return True
+
+
+# parsed top level statement, reused as long as its text doesn't change
+class ParsedStatement:
+    __slots__ = ("text", "line", "nodes", "declared", "required", "located")
+
+    def __init__(self, text, line, nodes, declared, required):
+        self.text = text
+        self.line = line
+        self.nodes = nodes
+        self.declared = declared
+        self.required = required
+
+        # nodes and tokens knowing their line, they move when lines are added or removed above
+        self.located = []
+        for node in walk(nodes):
+            if getattr(node, "line", None) is not None:
+                self.located.append(node)
+            if isinstance(node, DefineFunction):
+                self.located.append(node.name)
+                self.located.extend(node.parameters)
+
+    def move_to(self, line):
+        delta = line - self.line
+        if delta:
+            for item in self.located:
+                item.line += delta
+            self.line = line
+
+
+# parser keeping the statements of the last parse, only statements whose text changed are parsed again
+class IncrementalParser:
+    # directory is where the source is, imported paths are relative to it
+    def __init__(self, directory=None):
+        self.directory = directory
+        # text -> parsed statements with that text
+        self.statements = {}
+        # statements parsed by the last parse
+        self.changed = []
+
+    def _parse_statement(self, text, line):
+        lexer = Lexer(text)
+        lexer.line = line
+        parser = Parser(lexer, self.directory)
+        parser.symbols = _StatementSymbols()
+        nodes = parser.program().children
+        return ParsedStatement(text, line, nodes, set(parser.symbols), parser.symbols.required)
+
+    # parse the source into a new tree, the statements of the last parse are kept if it fails
+    def parse(self, source):
+        statements = {}
+        changed = []
+        declared = set()
+        tree = Program()
+
+        for line, text in split_statements(source):
+            # statements with the same text can't share nodes
+            same = statements.setdefault(text, [])
+            reusable = self.statements.get(text, ())
+            if len(same) < len(reusable):
+                statement = reusable[len(same)]
+                statement.move_to(line)
+            else:
+                statement = self._parse_statement(text, line)
+                changed.extend(statement.nodes)
+            missing = statement.required - declared
+            if missing:
+                raise Exception("Referencing variable before assignment: " + sorted(missing)[0])
+            declared |= statement.declared
+            same.append(statement)
+            tree.children.extend(statement.nodes)
+
+        self.statements = statements
+        self.changed = changed
+        return tree
@@ -0,0 +1,241 @@
+import builtins
+from token_types import TokenType
+from operators import COMPOUND_ASSIGN
+from visitor import NodeVisitor
+from custom_builtins import builtin_functions
+from parse import BinOp, Assign, CallArray, Repeat, Num, DefineFunction, TypedBinOp, TypedAssign, IntCallArray, IntRepeat, walk
+
+# types are the python types of the values, None is a value whose type isn't proven
+INT = int
+FLOAT = float
+STRING = str
+UNKNOWN = None
+# nothing is assigned yet, joining it with a type gives that type
+BOTTOM = object()
+
+NUMBERS = (INT, FLOAT)
+
+ARITHMETIC = {TokenType.PLUS, TokenType.MINUS, TokenType.ASTERISK, TokenType.SLASH}
+
+# python builtins whose result type doesn't depend on the arguments
+BUILTIN_RESULTS = {"len": INT, "int": INT, "float": FLOAT, "str": STRING}
+
+
+def join(first, second):
+    if first is BOTTOM:
+        return second
+    if second is BOTTOM or first is second:
+        return first
+    return UNKNOWN
+
+
+def arithmetic(op, left, right):
+    if left is BOTTOM or right is BOTTOM:
+        return BOTTOM
+    if left is INT and right is INT:
+        return FLOAT if op == TokenType.SLASH else INT
+    if left in NUMBERS and right in NUMBERS:
+        return FLOAT
+    if op == TokenType.PLUS and left is STRING and right is STRING:
+        return STRING
+    return UNKNOWN
+
+
+def _type_of(value):
+    kind = type(value)
+    return kind if kind in (INT, FLOAT, STRING) else UNKNOWN
+
+
+def _one():
+    node = Num.__new__(Num)
+    node.value = 1
+    return node
+
+
+# flow insensitive type inference, a variable has the joined type of all values assigned to it
+# in its scope and parameters have the joined type of the arguments of all call sites
+class TypeInference(NodeVisitor):
+    def __init__(self):
+        # (function name or None for the globals, variable name) -> type
+        self.variables = {}
+        # function name -> joined type of its return values
+        self.returns = {}
+        # function name -> definitions
+        self.functions = {}
+        # id of expression node -> type
+        self.types = {}
+        self.scope = None
+        self.changed = False
+
+    # infer the types of all expressions, returns id of expression node -> type
+    def infer(self, tree):
+        for node in tree.children:
+            if isinstance(node, DefineFunction):
+                self.functions.setdefault(node.name.text, []).append(node)
+
+        # types only grow, so this ends after a few rounds
+        self.changed = True
+        while self.changed:
+            self.changed = False
+            self.types.clear()
+            self.visit(tree)
+        return self.types
+
+    # infer the types and swap nodes for their specialized class, returns the number of specialized nodes
+    def specialize(self, tree):
+        self.infer(tree)
+        return sum(self._specialize(node) for node in walk(tree))
+
+    def _specialize(self, node):
+        kind = type(node)
+        if kind is BinOp:
+            left, right = self.types[id(node.left)], self.types[id(node.right)]
+            if node.op in ARITHMETIC:
+                proven = arithmetic(node.op, left, right) in NUMBERS + (STRING,)
+            else:
+                proven = left in NUMBERS and right in NUMBERS or left is STRING and right is STRING
+            if proven:
+                node.__class__ = TypedBinOp
+                return 1
+        elif kind is Assign and node.op in COMPOUND_ASSIGN:
+            if self.types[id(node)] in NUMBERS:
+                if node.right is None:
+                    node.right = _one()
+                node.__class__ = TypedAssign
+                return 1
+        elif kind is CallArray and self.types[id(node.index)] is INT:
+            node.__class__ = IntCallArray
+            return 1
+        elif kind is Repeat and self.types[id(node.count)] is INT:
+            node.__class__ = IntRepeat
+            return 1
+        return 0
+
+    def _assign(self, key, value):
+        old = self.variables.get(key, BOTTOM)
+        new = join(old, value)
+        if new is not old:
+            self.variables[key] = new
+            self.changed = True
+
+    def _block(self, children):
+        for child in children:
+            self.visit(child)
+
+    def visit(self, node):
+        value = super().visit(node)
+        self.types[id(node)] = value
+        return value
+
+    def visit_Program(self, node):
+        self._block(node.children)
+
+    def visit_Num(self, node):
+        return _type_of(node.value)
+
+    def visit_String(self, node):
+        return STRING
+
+    def visit_NoneType(self, node):
+        return UNKNOWN
+
+    def visit_Var(self, node):
+        return self.variables.get((self.scope, node.value), BOTTOM)
+
+    def visit_Array(self, node):
+        self._block(node.children)
+        return UNKNOWN
+
+    def visit_CallArray(self, node):
+        self.visit(node.index)
+        return UNKNOWN
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        if node.op in ARITHMETIC:
+            return arithmetic(node.op, left, right)
+        return UNKNOWN
+
+    def visit_UnaryOp(self, node):
+        value = self.visit(node.expression)
+        return value if value in NUMBERS or value is BOTTOM else UNKNOWN
+
+    def visit_CallFunction(self, node):
+        arguments = [self.visit(child) for child in node.parameters]
+        name = node.name
+        # builtins are called before user functions of the same name
+        if name in builtins.__dict__:
+            return BUILTIN_RESULTS.get(name, UNKNOWN)
+        if name in builtin_functions or name not in self.functions:
+            return UNKNOWN
+        for func in self.functions[name]:
+            for parameter, argument in zip(func.parameters, arguments):
+                self._assign((name, parameter.text), argument)
+        return self.returns.get(name, BOTTOM)
+
+    def visit_CallMethod(self, node):
+        self.visit(node.object_called)
+        self._block(node.method_called.parameters)
+        return UNKNOWN
+
+    def visit_Assign(self, node):
+        key = (self.scope, node.left.value)
+        if node.op == TokenType.EQ:
+            self._assign(key, self.visit(node.right))
+            return UNKNOWN
+        right = INT if node.right is None else self.visit(node.right)
+        value = arithmetic(COMPOUND_ASSIGN[node.op], self.visit(node.left), right)
+        self._assign(key, value)
+        return value
+
+    def visit_If(self, node):
+        if node.comparison is not None:
+            self.visit(node.comparison)
+        self._block(node.children)
+
+    def visit_Conditional(self, node):
+        self._block(node.cases)
+        if node.else_case is not None:
+            self.visit(node.else_case)
+
+    def visit_While(self, node):
+        self.visit(node.comparison)
+        self._block(node.children)
+
+    def visit_Repeat(self, node):
+        self.visit(node.count)
+        self._block(node.children)
+
+    def visit_Each(self, node):
+        self.visit(node.iterable)
+        self._assign((self.scope, node.iterator.value), UNKNOWN)
+        self._block(node.children)
+
+    def visit_ParallelEach(self, node):
+        self.visit_Each(node)
+        if node.target is not None:
+            self._assign((self.scope, node.target.value), UNKNOWN)
+
+    # calls of imported functions have unknown types, and the module may call
+    # every function of the program with arguments of any type
+    def visit_Import(self, node):
+        for name, definitions in self.functions.items():
+            for func in definitions:
+                for parameter in func.parameters:
+                    self._assign((name, parameter.text), UNKNOWN)
+
+    def visit_Collect(self, node):
+        self.visit(node.expression)
+
+    def visit_DefineFunction(self, node):
+        outer, self.scope = self.scope, node.name.text
+        self._block(node.children)
+        value = self.visit(node.return_statement)
+        name = node.name.text
+        old = self.returns.get(name, BOTTOM)
+        new = join(old, value)
+        if new is not old:
+            self.returns[name] = new
+            self.changed = True
+        self.scope = outer
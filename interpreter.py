@@ -1,58 +1,111 @@
+import builtins
+import contextlib
+import io
+import sys
+import threading
+import types
 from token_types import TokenType
+from operators import BINARY_OPERATORS, ASSIGN_OPERATORS
 from custom_builtins import builtin_functions
+from visitor import NodeVisitor
+from resolver import Resolver
+from memo import DEFAULT_MEMO_SIZE, IMMUTABLE_RESULTS, MISSING, MemoCache, is_pure
+from string_builder import StringBuilder
+from parallel import WorkerPool
+from modules import module_cache
+from parse import PURE_METHODS, Var, CallArray, CallFunction, CallMethod, walk
 
 
-class NodeVisitor:
-    def visit(self, node):
-        method_name = "visit_" + type(node).__name__
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
+# value of slots whose variable is not assigned yet
+UNBOUND = object()
 
-    def generic_visit(self, node):
-        raise Exception('No visit_{} method'.format(type(node).__name__))
+# methods of these types can be cached per receiver type and called unbound
+CACHEABLE_METHODS = (types.FunctionType, types.MethodDescriptorType, types.WrapperDescriptorType)
 
 
 class Interpreter(NodeVisitor):
-    GLOBAL_SCOPE = {}
-    FUNCTIONS = {}
-    LOCAL_SCOPES = []
 
-    def __init__(self, parser):
+    # memo_size bounds the results kept per memoized function, 0 turns memoization off,
+    # workers is the number of processes of peach loops, 1 runs them in this process
+    def __init__(self, parser=None, memo_size=DEFAULT_MEMO_SIZE, workers=None, builtins=None):
         self.parser = parser
+        self.memo_size = memo_size
+        self.pool = WorkerPool(workers)
+        # host provided functions, they take precedence over all other functions
+        self.host_builtins = dict(builtins or {})
+
+        # all state belongs to the instance, several interpreters can run in one process
+        self.resolver = Resolver()
+        self.global_frame = []
+        self.frame = self.global_frame
+        self.functions = {}
+        # bumped whenever a function is rebound, invalidates the inline caches of call sites
+        self.function_version = 0
+        # name -> MemoCache of the memoized functions
+        self.memos = {}
+        # values of the collect statements of the running peach loop
+        self.collected = None
+        # id of peach loop -> (function version, whether it runs in parallel)
+        self.peach_parallel = {}
+        # functions reloaded by other threads, bound by the next call of the program
+        self.reloads = []
+        self.reloads_lock = threading.Lock()
+
+    @property
+    def globals(self):
+        return {name: self._load(self.global_frame, slot) for name, slot in self.resolver.globals.items()
+                if slot < len(self.global_frame) and self.global_frame[slot] is not UNBOUND}
+
+    # value of a slot, a string builder is joined into the str it stands for
+    def _load(self, frame, slot):
+        value = frame[slot]
+        if value.__class__ is StringBuilder:
+            value = frame[slot] = str(value)
+        return value
+
+    # MemoCache of every memoized function, for hit and miss statistics
+    def memo_stats(self):
+        return {name: memo for name, memo in self.memos.items() if memo is not None}
+
+    def _unbound(self, name):
+        raise Exception("Referencing variable before assignment: " + name)
 
     def visit_BinOp(self, node):
-        if node.op.type == TokenType.PLUS:
+        if node.op == TokenType.PLUS:
             return self.visit(node.left) + self.visit(node.right)
-        elif node.op.type == TokenType.MINUS:
+        elif node.op == TokenType.MINUS:
             return self.visit(node.left) - self.visit(node.right)
-        elif node.op.type == TokenType.SLASH:
+        elif node.op == TokenType.SLASH:
             return self.visit(node.left) / self.visit(node.right)
-        elif node.op.type == TokenType.ASTERISK:
+        elif node.op == TokenType.ASTERISK:
             return self.visit(node.left) * self.visit(node.right)
-        else:
-            operations = {
-                TokenType.EQEQ: lambda left, right: left == right,
-                TokenType.GTEQ: lambda left, right: left >= right,
-                TokenType.GT: lambda left, right: left > right,
-                TokenType.LTEQ: lambda left, right: left <= right,
-                TokenType.LT: lambda left, right: left < right,
-                TokenType.NOTEQ: lambda left, right: left != right,
-            }
-            return operations[node.op.type](self.visit(node.left), self.visit(node.right))
+        return BINARY_OPERATORS[node.op](self.visit(node.left), self.visit(node.right))
+
+    def visit_TypedBinOp(self, node):
+        return BINARY_OPERATORS[node.op](self.visit(node.left), self.visit(node.right))
 
     def visit_Num(self, node):
         return node.value
 
     def visit_CallArray(self, node):
-        return self.GLOBAL_SCOPE[node.name][int(self.visit(node.index))]
+        array = self._load(self.global_frame, node.slot)
+        if array is UNBOUND:
+            self._unbound(node.name)
+        return array[int(self.visit(node.index))]
+
+    def visit_IntCallArray(self, node):
+        array = self._load(self.global_frame, node.slot)
+        if array is UNBOUND:
+            self._unbound(node.name)
+        return array[self.visit(node.index)]
 
     def visit_Array(self, node):
         return [self.visit(child) for child in node.children]
 
     def visit_UnaryOp(self, node):
-        if node.op.type == TokenType.PLUS:
+        if node.op == TokenType.PLUS:
             return +self.visit(node.expression)
-        if node.op.type == TokenType.MINUS:
+        if node.op == TokenType.MINUS:
             return -self.visit(node.expression)
 
     def visit_If(self, node):
@@ -65,57 +118,196 @@ class Interpreter(NodeVisitor):
     def visit_NoneType(self, node):
         return None
 
+    # resolve the target of a call site, in the order python builtins, custom builtins, user functions
+    def _resolve_call(self, node):
+        name = node.name
+        if name in self.host_builtins:
+            return self, self.function_version, self.host_builtins[name], False, None
+        if name in builtins.__dict__:
+            return self, self.function_version, builtins.__dict__[name], False, None
+        if name in builtin_functions:
+            return self, self.function_version, builtin_functions[name], False, None
+        if name not in self.functions:
+            raise Exception("Calling undefined function: " + name)
+        func = self.functions[name]
+        if len(node.parameters) < len(func.parameters):
+            raise Exception("Function {} takes {} arguments but {} were given".format(
+                name, len(func.parameters), len(node.parameters)))
+        return self, self.function_version, func, True, self._memo(func)
+
+    # results cache of a user function, None if it isn't memoized
+    def _memo(self, func):
+        name = func.name.text
+        if name not in self.memos:
+            memoize = func.memo
+            if memoize is None:
+                memoize = is_pure(func, self.functions, self.host_builtins, builtins.__dict__, builtin_functions)
+            self.memos[name] = MemoCache(self.memo_size) if memoize and self.memo_size > 0 else None
+        return self.memos[name]
+
     def visit_CallFunction(self, node):
-        arguments = []
-        for child in node.parameters:
-            arguments.append(self.visit(child))
-        if node.name in globals()["__builtins__"]:
-            return globals()["__builtins__"][node.name](*arguments)
-        elif node.name in builtin_functions:
-            return builtin_functions[node.name](*arguments)
-        else:
-            self.LOCAL_SCOPES.append({})
-            func = self.FUNCTIONS[node.name]
-            for index, parameter in enumerate(func.parameters):
-                self.LOCAL_SCOPES[-1][parameter.text] = arguments[index]
-            statements = func.children
-            for statement in statements:
-                self.visit(statement)
+        if self.reloads:
+            self._bind_reloads()
+        arguments = [self.visit(child) for child in node.parameters]
 
-            return_value = self.visit(func.return_statement)
+        cache = node.cache
+        if cache is None or cache[0] is not self or cache[1] != self.function_version:
+            cache = node.cache = self._resolve_call(node)
+        if not cache[3]:
+            return cache[2](*arguments)
 
-            self.LOCAL_SCOPES.pop(-1)
+        memo = cache[4]
+        if memo is None:
+            return self._call_function(cache[2], arguments)
+        types = tuple(map(type, arguments))
+        # arrays can change between two calls, only calls with immutable arguments are memoized
+        if not all(kind in IMMUTABLE_RESULTS for kind in types):
+            return self._call_function(cache[2], arguments)
+        # 1.0 and True are equal keys but not equal arguments
+        key = tuple(arguments) + types
+        result = memo.lookup(key)
+        if result is MISSING:
+            result = self._call_function(cache[2], arguments)
+            memo.store(key, result)
+        return result
 
-            return return_value
+    def _call_function(self, func, arguments):
+        frame = [UNBOUND] * func.frame_size
+        frame[:len(func.parameters)] = arguments[:len(func.parameters)]
+
+        caller, self.frame = self.frame, frame
+        for statement in func.children:
+            self.visit(statement)
+
+        return_value = self.visit(func.return_statement)
+
+        self.frame = caller
+
+        return return_value
 
     def visit_Repeat(self, node):
         for i in range(int(self.visit(node.count))):
             for child in node.children:
                 self.visit(child)
 
+    def visit_IntRepeat(self, node):
+        for i in range(self.visit(node.count)):
+            for child in node.children:
+                self.visit(child)
+
     def visit_Each(self, node):
         iterable = self.visit(node.iterable)
+        slot = node.iterator.slot
         for i in iterable:
-            self.get_current_scope()[node.iterator.value] = i
+            self.frame[slot] = i
             for child in node.children:
                 self.visit(child)
-        del self.get_current_scope()[node.iterator.value]
+        if self.frame[slot] is UNBOUND:
+            self._unbound(node.iterator.value)
+        self.frame[slot] = UNBOUND
+
+    def visit_ParallelEach(self, node):
+        items = list(self.visit(node.iterable))
+        # host builtins can't be sent to other processes
+        if self.pool.workers > 1 and len(items) > 1 and not self.host_builtins and self._parallel(node):
+            results = []
+            for collected, output in self.pool.map_chunks(_run_chunk, self._peach_state(node), items):
+                sys.stdout.write(output)
+                results.extend(collected)
+        else:
+            results = self._peach(node, items)
+        if node.target is not None:
+            self.frame[node.target.slot] = results
+
+    # whether the iterations can run in other processes, the parser checked the body itself
+    # but functions changing their arguments would only change the copies in the workers
+    def _parallel(self, node):
+        entry = self.peach_parallel.get(id(node))
+        if entry is None or entry[0] != self.function_version:
+            entry = self.peach_parallel[id(node)] = self.function_version, not _changes_arguments(
+                node.children, self.functions, {**builtin_functions, **builtins.__dict__, **self.host_builtins}, set())
+        return entry[1]
+
+    # run the body of a peach loop for every item, returns the collected values
+    def _peach(self, node, items):
+        slot = node.iterator.slot
+        outer, self.collected = self.collected, []
+        for item in items:
+            self.frame[slot] = item
+            for child in node.children:
+                self.visit(child)
+        self.frame[slot] = UNBOUND
+        collected, self.collected = self.collected, outer
+        return collected
+
+    # what a worker needs to run the body of a peach loop: the loop, the user functions and
+    # the variables the body reads, arrays are read from the globals by the functions as well
+    def _peach_state(self, node):
+        variables = {child.slot for child in walk(node.children) if isinstance(child, Var)}
+        arrays = {child.slot for child in walk([node.children, list(self.functions.values())])
+                  if isinstance(child, CallArray)}
+        if self.frame is self.global_frame:
+            frame_size, frame_values = None, None
+            arrays |= variables
+        else:
+            frame_size, frame_values = len(self.frame), self._bound(self.frame, variables)
+        return (node, self.functions, self.memo_size,
+                len(self.global_frame), self._bound(self.global_frame, arrays), frame_size, frame_values)
+
+    # slot -> value of the slots which are assigned, UNBOUND isn't the same object in another process
+    def _bound(self, frame, slots):
+        return {slot: self._load(frame, slot) for slot in slots if frame[slot] is not UNBOUND}
+
+    def visit_Collect(self, node):
+        self.collected.append(self.visit(node.expression))
 
     def visit_String(self, node):
         return node.value
 
     def visit_CallMethod(self, node):
-        object_called = node.object_called
         method_called = node.method_called
+        arguments = [self.visit(child) for child in method_called.parameters]
+        receiver = self.visit(node.object_called)
+
+        cache = node.cache
+        if cache is not None and cache[0] is type(receiver):
+            return cache[1](receiver, *arguments)
 
-        arguments = []
-        for child in method_called.parameters:
-            arguments.append(self.visit(child))
+        # objects without a __dict__ can't shadow the methods of their type
+        method = getattr(type(receiver), method_called.name, None)
+        if isinstance(method, CACHEABLE_METHODS) and not hasattr(receiver, "__dict__"):
+            node.cache = type(receiver), method
+            return method(receiver, *arguments)
+        return getattr(receiver, method_called.name)(*arguments)
 
-        return getattr(self.get_current_scope()[object_called.token.text], method_called.name)(*arguments)
+    # define or replace a function of a program which is already running, can be called from any thread,
+    # the global variables are kept and calls which already started finish with the old body
+    def reload_function(self, node):
+        with self.reloads_lock:
+            self.reloads.append(node)
+
+    # bind the reloaded functions on the thread running the program, so the functions, the memos
+    # and the resolver never change while a call reads them
+    def _bind_reloads(self):
+        with self.reloads_lock:
+            reloads, self.reloads = self.reloads, []
+        for node in reloads:
+            self.resolver.visit(node)
+            self.global_frame.extend([UNBOUND] * (len(self.resolver.globals) - len(self.global_frame)))
+            self.visit_DefineFunction(node)
 
     def visit_DefineFunction(self, node):
-        self.FUNCTIONS[node.name.text] = node
+        name = node.name.text
+        if name in self.functions and self.functions[name] is not node:
+            self.function_version += 1
+            # purity and results depend on the functions which are called
+            self.memos.clear()
+        self.functions[name] = node
+
+    # bind the functions of the module and of the modules it imports
+    def visit_Import(self, node):
+        for func in module_cache.functions(node.path):
+            self.visit_DefineFunction(func)
 
     def visit_While(self, node):
         condition = self.visit(node.comparison)
@@ -132,34 +324,116 @@ class Interpreter(NodeVisitor):
             self.visit(node.else_case)
 
     def visit_Assign(self, node):
-        name = node.left.value
         value = None
-        if node.op.type == TokenType.EQ:
+        if node.op == TokenType.EQ:
             value = self.visit(node.right)
-        elif node.op.type == TokenType.PLUSPLUS:
+        elif node.op == TokenType.PLUSPLUS:
             value = self.visit(node.left) + 1
-        elif node.op.type == TokenType.MINUSMINUS:
+        elif node.op == TokenType.MINUSMINUS:
             value = self.visit(node.left) - 1
-        elif node.op.type == TokenType.PLUSEQ:
-            value = self.get_current_scope()[name] + self.visit(node.right)
-        elif node.op.type == TokenType.MINUSEQ:
-            value = self.get_current_scope()[name] - self.visit(node.right)
-        elif node.op.type == TokenType.ASTERISKEQ:
-            value = self.get_current_scope()[name] * self.visit(node.right)
-        elif node.op.type == TokenType.SLASHEQ:
-            value = self.get_current_scope()[name] / self.visit(node.right)
-        self.get_current_scope()[name] = value
+        elif node.op == TokenType.PLUSEQ:
+            value = self.visit(node.left) + self.visit(node.right)
+        elif node.op == TokenType.MINUSEQ:
+            value = self.visit(node.left) - self.visit(node.right)
+        elif node.op == TokenType.ASTERISKEQ:
+            value = self.visit(node.left) * self.visit(node.right)
+        elif node.op == TokenType.SLASHEQ:
+            value = self.visit(node.left) / self.visit(node.right)
+        self.frame[node.left.slot] = value
+
+    def visit_TypedAssign(self, node):
+        slot = node.left.slot
+        value = self.frame[slot]
+        if value is UNBOUND:
+            self._unbound(node.left.value)
+        self.frame[slot] = ASSIGN_OPERATORS[node.op](value, self.visit(node.right))
+
+    def visit_AppendAssign(self, node):
+        slot = node.left.slot
+        if self.frame[slot] is UNBOUND:
+            self._unbound(node.left.value)
+        right = self.visit(node.right if node.op == TokenType.PLUSEQ else node.right.right)
+        # read after the right side, reading the variable there joins its builder
+        value = self.frame[slot]
+
+        if right.__class__ is str:
+            if value.__class__ is StringBuilder:
+                value.append(right)
+                return
+            if value.__class__ is str:
+                builder = self.frame[slot] = StringBuilder(value)
+                builder.append(right)
+                return
+        if value.__class__ is StringBuilder:
+            value = str(value)
+        self.frame[slot] = value + right
 
     def visit_Program(self, node):
         for child in node.children:
             self.visit(child)
 
     def visit_Var(self, node):
-        return self.get_current_scope()[node.value]
+        value = self.frame[node.slot]
+        if value is UNBOUND:
+            self._unbound(node.value)
+        if value.__class__ is StringBuilder:
+            value = self.frame[node.slot] = str(value)
+        return value
+
+    # run the tree, parse it first if none is given
+    def interpret(self, tree=None):
+        if tree is None:
+            tree = self.parser.parse()
+        self.resolver.resolve(tree)
+        return self.execute(tree)
+
+    # run a tree which is already resolved by the resolver of this interpreter
+    def execute(self, tree):
+        self.global_frame.extend([UNBOUND] * (len(self.resolver.globals) - len(self.global_frame)))
+        try:
+            return self.visit(tree)
+        finally:
+            self.pool.close()
+
+
+# whether the user functions the nodes call, directly or through other functions,
+# may call a method changing a value, builtins shadow user functions like they do when called
+def _changes_arguments(nodes, functions, builtins, visiting):
+    methods = set()
+    for node in walk(nodes):
+        if isinstance(node, CallMethod):
+            methods.add(id(node.method_called))
+        elif isinstance(node, CallFunction) and id(node) not in methods:
+            name = node.name
+            if name in builtins or name not in functions or name in visiting:
+                continue
+            visiting.add(name)
+            func = functions[name]
+            if any(isinstance(child, CallMethod) and child.method_called.name not in PURE_METHODS
+                   for child in walk(func)):
+                return True
+            if _changes_arguments(func, functions, builtins, visiting):
+                return True
+    return False
+
+
+def _frame(size, values):
+    frame = [UNBOUND] * size
+    for slot, value in values.items():
+        frame[slot] = value
+    return frame
+
 
-    def interpret(self):
-        tree = self.parser.parse()
-        return self.visit(tree)
+# runs in a worker process, the body of a peach loop for a chunk of its items,
+# returns the collected values and the printed output
+def _run_chunk(state, items):
+    node, functions, memo_size, global_size, global_values, frame_size, frame_values = state
+    interpreter = Interpreter(memo_size=memo_size, workers=1)
+    interpreter.functions = functions
+    interpreter.global_frame = _frame(global_size, global_values)
+    interpreter.frame = interpreter.global_frame if frame_size is None else _frame(frame_size, frame_values)
 
-    def get_current_scope(self):
-        return self.GLOBAL_SCOPE if len(self.LOCAL_SCOPES) == 0 else self.LOCAL_SCOPES[-1]
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        collected = interpreter._peach(node, items)
+    return collected, output.getvalue()
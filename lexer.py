@@ -1,3 +1,4 @@
+import re
 import sys
 from token_types import TokenType
 
@@ -9,116 +10,119 @@ def _build_types():
     return types
 
 
+def _build_keywords():
+    keywords = {}
+    for token in TokenType:
+        if token.value.isalpha():
+            keywords[token.value] = token
+    return keywords
+
+
 # all available types
 TYPES = _build_types()
 
+# words which are not identifiers
+KEYWORDS = _build_keywords()
+
+# every token of the language, alternatives are tried in order
+TOKEN_PATTERN = re.compile(r"""
+    (?P<whitespace>[ \t\r]+)
+  | (?P<newline>\n)
+  | (?P<comment>\#[^\n]*)
+  | (?P<word>[^\W\d_]+)
+  | (?P<bad_number>\d+\.(?!\d))
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<string>"[^"\r\n\t\\%]*")
+  | (?P<operator>\+\+|--|[-+*/=!<>]=|[-+*/=<>(){},.\[\]])
+  | (?P<bad_string>")
+  | (?P<unknown>.)
+""", re.VERBOSE | re.DOTALL)
+
 
 # Lexer to tokenize text
 class Lexer:
 
+    # input is the source text or an iterable of lines like an open file,
+    # tokens never span lines so files are lexed line by line
     def __init__(self, input):
-        self.input = input + "\n"
-        self.current_char = ''
-        self.current_pos = -1
-        self._next_char()
-
-        self.tokens = []
-
-    # set next char of input
-    def _next_char(self):
-        self.current_pos += 1
-        if self.current_pos >= len(self.input):
-            self.current_char = '\0'
-        else:
-            self.current_char = self.input[self.current_pos]
-
-    # get next char
-    def _peek(self):
-        if self.current_pos + 1 >= len(self.input):
-            return '\0'
-        else:
-            return self.input[self.current_pos + 1]
+        self.input = input
+        self.line = 1
+        self.line_start = 0
+
+        self._scanner = self._scan()
 
     # raise Exception
     def _abort(self, message):
-        raise Exception("Lexing error: " + message)
-
-    def _skip_whitespace(self):
-        while self.current_char in {' ', '\t', '\r'}:
-            self._next_char()
-
-    def _skip_comment(self):
-        if self.current_char == TokenType.COMMENT:
-            while self.current_char != "\n":
-                self._next_char()
+        raise Exception("Lexing error: " + message + " (line " + str(self.line) + ")")
+
+    # generate all tokens of the input
+    def _scan(self):
+        chunks = (self.input,) if isinstance(self.input, str) else self.input
+        last = None
+        for chunk in chunks:
+            self.line_start = 0
+            for last in self._scan_text(chunk):
+                yield last
+
+        # the last line doesn't need a line break
+        if last is None or last.type != TokenType.NEWLINE:
+            yield Token("\n", TokenType.NEWLINE, self.line, 1)
+        yield Token("\0", TokenType.EOF, self.line, 1)
+
+    # generate the tokens of a piece of text, comments and whitespace are skipped
+    def _scan_text(self, chunk):
+        types = TYPES
+        keywords = KEYWORDS
+        intern = sys.intern
+
+        for match in TOKEN_PATTERN.finditer(chunk):
+            kind = match.lastgroup
+            start = match.start()
+            column = start - self.line_start + 1
+
+            if kind == "word":
+                text = match.group()
+                yield Token(intern(text), keywords.get(text, TokenType.IDENT), self.line, column)
+            elif kind == "whitespace" or kind == "comment":
+                continue
+            elif kind == "operator":
+                text = match.group()
+                yield Token(text, types[text], self.line, column)
+            elif kind == "newline":
+                yield Token("\n", TokenType.NEWLINE, self.line, column)
+                self.line += 1
+                self.line_start = match.end()
+            elif kind == "number":
+                yield Token(match.group(), TokenType.NUMBER, self.line, column)
+            elif kind == "string":
+                yield Token(match.group()[1:-1], TokenType.STRING, self.line, column)
+            elif kind == "bad_number":
+                self._abort("Illegal character in number")
+            elif kind == "bad_string":
+                self._abort("Illegal character in string.")
+            else:
+                self._abort("Unknown token: " + match.group())
 
     # get current token
     def get_token(self):
-        # ignore whitespace and comments
-        self._skip_whitespace()
-        self._skip_comment()
-
-        token = None
-        # if combined token
-        if self.current_char + self._peek() in TYPES and not self.current_char.isalpha():
-            last_char = self.current_char
-            self._next_char()
-            combined_char = last_char + self.current_char
-
-            token = Token(combined_char, TYPES[combined_char])
-        # if single token
-        elif self.current_char in TYPES:
-            token = Token(self.current_char, TYPES[self.current_char])
-        # if string
-        elif self.current_char == "\"":
-            self._next_char()
-            start_pos = self.current_pos
-
-            while self.current_char != "\"":
-                if self.current_char in {"\r", "\n", "\t", "\\", "%"}:
-                    self._abort("Illegal character in string.")
-                self._next_char()
-            token = Token(self.input[start_pos: self.current_pos], TokenType.STRING)
-        # if number
-        elif self.current_char.isdigit():
-            start_pos = self.current_pos
-
-            while self._peek().isdigit():
-                self._next_char()
-            if self._peek() == ".":
-                self._next_char()
-                if not self._peek().isdigit():
-                    self._abort("Illegal character in number")
-                while self._peek().isdigit():
-                    self._next_char()
-            token = Token(self.input[start_pos: self.current_pos + 1], TokenType.NUMBER)
-        # if letter
-        elif self.current_char.isalpha():
-            start_pos = self.current_pos
-            while self._peek().isalpha():
-                self._next_char()
-            text = self.input[start_pos: self.current_pos + 1]
-            token = Token(text, None)
-            token.set_keyword()
-        else:
-            self._abort("Unknown token: " + self.current_char)
-        self._next_char()
-
-        self.tokens.append(token)
-
+        token = next(self._scanner, None)
+        if token is None:
+            token = Token("\0", TokenType.EOF, self.line, 1)
         return token
 
 
 class Token:
-    def __init__(self, text, type):
+    __slots__ = ("text", "type", "line", "column")
+
+    def __init__(self, text, type, line=0, column=0):
         self.text = text
         self.type = type
+        self.line = line
+        self.column = column
 
     # set keyword as tokentype
     def set_keyword(self):
-        for kind in TokenType:
-            if kind.value == self.text:
-                self.type = kind
-                break
-        else:
-            self.type = TokenType.IDENT
+        self.type = KEYWORDS.get(self.text, TokenType.IDENT)
+
+    def __repr__(self):
+        return "Token({!r}, {}, {}:{})".format(self.text, self.type.name, self.line, self.column)
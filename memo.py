@@ -0,0 +1,77 @@
+from collections import OrderedDict
+from parse import CallFunction, CallMethod, CallArray, PURE_METHODS, walk
+
+# results kept per memoized function
+DEFAULT_MEMO_SIZE = 1024
+
+# python builtins without side effects, every other builtin is treated as impure
+PURE_BUILTINS = {
+    "abs", "bool", "chr", "divmod", "float", "hash", "int", "len", "max", "min",
+    "ord", "pow", "repr", "round", "str", "sum", "tuple",
+}
+
+# results of these types can't be changed by the caller, so they can be shared between calls
+IMMUTABLE_RESULTS = (int, float, str, bool, type(None))
+
+# returned by lookup when there is no entry
+MISSING = object()
+
+
+# whether a function always returns the same result for the same arguments, names are resolved
+# in the order calls resolve them: host builtins, python builtins, custom builtins, user functions
+def is_pure(func, functions, host_builtins, builtins, custom_builtins, visiting=None):
+    visiting = set() if visiting is None else visiting
+    visiting.add(func.name.text)
+    # the called method is a CallFunction node too, it is not a function call
+    methods = set()
+    for node in walk(func):
+        if isinstance(node, CallArray):
+            # arrays are read from the globals
+            return False
+        if isinstance(node, CallMethod):
+            if node.method_called.name not in PURE_METHODS:
+                return False
+            methods.add(id(node.method_called))
+        elif isinstance(node, CallFunction) and id(node) not in methods:
+            name = node.name
+            if name in host_builtins:
+                # host functions can have side effects even when they shadow a pure builtin
+                return False
+            if name in builtins:
+                if name not in PURE_BUILTINS:
+                    return False
+            elif name in custom_builtins or name not in functions:
+                return False
+            elif name not in visiting and not is_pure(
+                    functions[name], functions, host_builtins, builtins, custom_builtins, visiting):
+                return False
+    return True
+
+
+# size bounded LRU of the results of one function, keyed on the argument tuple
+class MemoCache:
+    def __init__(self, maxsize=DEFAULT_MEMO_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # raises TypeError for unhashable arguments
+    def lookup(self, key):
+        result = self.entries.get(key, MISSING)
+        if result is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return result
+
+    def store(self, key, result):
+        if type(result) not in IMMUTABLE_RESULTS:
+            return
+        self.entries[key] = result
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def report(self):
+        return "hits: {}, misses: {}, size: {}".format(self.hits, self.misses, len(self.entries))
@@ -0,0 +1,72 @@
+import os
+import threading
+from lexer import Lexer
+from parse import Parser, DefineFunction, Import, CallArray, walk
+from resolver import Resolver
+
+
+# parsed module, every program of the process importing it shares it until the file changes
+class Module:
+    def __init__(self, path, mtime, statements):
+        self.path = path
+        self.mtime = mtime
+        # the DefineFunction and Import nodes of the module, in source order
+        self.statements = statements
+
+
+# modules of the process keyed by absolute path, a module is parsed again when its modification time changes
+class ModuleCache:
+    def __init__(self):
+        self.modules = {}
+        self.parses = 0
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        path = os.path.abspath(path)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            raise Exception("Importing missing module: " + path)
+        with self._lock:
+            module = self.modules.get(path)
+            if module is None or module.mtime != mtime:
+                module = self.modules[path] = self._parse(path, mtime)
+        return module
+
+    def _parse(self, path, mtime):
+        with open(path, "r") as file:
+            tree = Parser(Lexer(file.read()), os.path.dirname(path)).parse()
+        self.parses += 1
+
+        # modules have no globals of their own, so they only define functions
+        for statement in tree.children:
+            if not isinstance(statement, (DefineFunction, Import)):
+                raise Exception("Modules may only define functions and import modules: {} line {}".format(
+                    path, statement.line))
+        for node in walk(tree):
+            if isinstance(node, CallArray):
+                raise Exception("Functions of modules can't read the array " + node.name + ": " + path)
+
+        # slots of the function frames are the same for every importer
+        resolver = Resolver()
+        for statement in tree.children:
+            resolver.visit(statement)
+        return Module(path, mtime, tree.children)
+
+    # functions of the module and of the modules it imports, in the order they are defined
+    def functions(self, path, visited=None):
+        visited = set() if visited is None else visited
+        module = self.load(path)
+        visited.add(module.path)
+        functions = []
+        for statement in module.statements:
+            if isinstance(statement, Import):
+                if os.path.abspath(statement.path) not in visited:
+                    functions.extend(self.functions(statement.path, visited))
+            else:
+                functions.append(statement)
+        return functions
+
+
+# shared by all interpreters of the process
+module_cache = ModuleCache()
@@ -0,0 +1,34 @@
+import operator
+from token_types import TokenType
+
+# operators of the language shared by the engines and the optimizer
+
+BINARY_OPERATORS = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.SLASH: operator.truediv,
+    TokenType.ASTERISK: operator.mul,
+    TokenType.EQEQ: operator.eq,
+    TokenType.GTEQ: operator.ge,
+    TokenType.GT: operator.gt,
+    TokenType.LTEQ: operator.le,
+    TokenType.LT: operator.lt,
+    TokenType.NOTEQ: operator.ne,
+}
+
+UNARY_OPERATORS = {
+    TokenType.PLUS: operator.pos,
+    TokenType.MINUS: operator.neg,
+}
+
+# binary operator applied by a compound assignment, ++ and -- apply it to 1
+COMPOUND_ASSIGN = {
+    TokenType.PLUSEQ: TokenType.PLUS,
+    TokenType.MINUSEQ: TokenType.MINUS,
+    TokenType.ASTERISKEQ: TokenType.ASTERISK,
+    TokenType.SLASHEQ: TokenType.SLASH,
+    TokenType.PLUSPLUS: TokenType.PLUS,
+    TokenType.MINUSMINUS: TokenType.MINUS,
+}
+
+ASSIGN_OPERATORS = {op: BINARY_OPERATORS[binary] for op, binary in COMPOUND_ASSIGN.items()}
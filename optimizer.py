@@ -0,0 +1,249 @@
+from token_types import TokenType
+from operators import BINARY_OPERATORS, UNARY_OPERATORS
+from interpreter import NodeVisitor
+from parse import Num, String, CallFunction, DefineFunction, Import, walk
+from inference import TypeInference, NUMBERS
+
+FOLD = "fold"
+IDENTITY = "identity"
+PRUNE = "prune"
+DEAD_FUNCTIONS = "dead-functions"
+SPECIALIZE = "specialize"
+
+PASSES = (FOLD, IDENTITY, PRUNE, DEAD_FUNCTIONS, SPECIALIZE)
+
+# passes enabled by -O0, -O1 and -O2
+LEVELS = {
+    0: (),
+    1: (FOLD, IDENTITY, SPECIALIZE),
+    2: (FOLD, IDENTITY, PRUNE, DEAD_FUNCTIONS, SPECIALIZE),
+}
+
+
+def _is_constant(node):
+    return isinstance(node, (Num, String))
+
+
+def _constant(value):
+    node = String.__new__(String) if isinstance(value, str) else Num.__new__(Num)
+    node.value = value
+    return node
+
+
+# only integer constants keep the type of the other operand, x + 0.0 and x / 1 make x a float
+def _is_number(node, value):
+    return isinstance(node, Num) and type(node.value) is int and node.value == value
+
+
+# Optimizer simplifying the AST between parsing and interpreting
+class Optimizer(NodeVisitor):
+    def __init__(self, passes=LEVELS[2]):
+        for name in passes:
+            if name not in PASSES:
+                raise Exception("Unknown optimization pass: " + name)
+        self.passes = set(passes)
+        self.stats = {name: 0 for name in PASSES}
+        self.optimized = False
+        # id of expression node -> type inferred before the tree is changed, used by the identity pass
+        self.types = {}
+
+    @classmethod
+    def for_level(cls, level, disabled=()):
+        return cls([name for name in LEVELS[level] if name not in disabled])
+
+    def optimize(self, tree):
+        self.optimized = True
+        if not self.passes:
+            return tree
+        if IDENTITY in self.passes:
+            self.types = TypeInference().infer(tree)
+        tree = self.visit(tree)
+        if DEAD_FUNCTIONS in self.passes:
+            self._remove_dead_functions(tree)
+        # last, the other passes change the types of expressions
+        if SPECIALIZE in self.passes:
+            self.stats[SPECIALIZE] += TypeInference().specialize(tree)
+        return tree
+
+    # x + 0 is only x if x is a number, for arrays it would be the same array instead of a copy
+    def _is_numeric(self, node):
+        if isinstance(node, (Num, String)):
+            return isinstance(node, Num)
+        return self.types.get(id(node)) in NUMBERS
+
+    def report(self):
+        return ", ".join("{}: {}".format(name, self.stats[name]) for name in PASSES if name in self.passes)
+
+    # optimize statements, a statement may be replaced by any number of statements
+    def _statements(self, children):
+        result = []
+        for child in children:
+            child = self.visit(child)
+            if isinstance(child, list):
+                result.extend(child)
+            elif child is not None:
+                result.append(child)
+        return result
+
+    def _expressions(self, children):
+        return [self.visit(child) for child in children]
+
+    def visit_Program(self, node):
+        node.children = self._statements(node.children)
+        return node
+
+    def visit_Num(self, node):
+        return node
+
+    def visit_String(self, node):
+        return node
+
+    def visit_Var(self, node):
+        return node
+
+    def visit_NoneType(self, node):
+        return node
+
+    def visit_Array(self, node):
+        node.children = self._expressions(node.children)
+        return node
+
+    def visit_CallArray(self, node):
+        node.index = self.visit(node.index)
+        return node
+
+    def visit_CallFunction(self, node):
+        node.parameters = self._expressions(node.parameters)
+        return node
+
+    def visit_CallMethod(self, node):
+        self.visit(node.method_called)
+        return node
+
+    def visit_BinOp(self, node):
+        node.left = self.visit(node.left)
+        node.right = self.visit(node.right)
+
+        if FOLD in self.passes and _is_constant(node.left) and _is_constant(node.right):
+            try:
+                value = BINARY_OPERATORS[node.op](node.left.value, node.right.value)
+            except (ArithmeticError, TypeError):
+                # keep the error for runtime
+                return node
+            self.stats[FOLD] += 1
+            return _constant(value)
+
+        if IDENTITY in self.passes:
+            if (node.op in {TokenType.PLUS, TokenType.MINUS} and _is_number(node.right, 0)
+                    or node.op == TokenType.ASTERISK and _is_number(node.right, 1)) and self._is_numeric(node.left):
+                self.stats[IDENTITY] += 1
+                return node.left
+            if (node.op == TokenType.PLUS and _is_number(node.left, 0)
+                    or node.op == TokenType.ASTERISK and _is_number(node.left, 1)) and self._is_numeric(node.right):
+                self.stats[IDENTITY] += 1
+                return node.right
+        return node
+
+    def visit_UnaryOp(self, node):
+        node.expression = self.visit(node.expression)
+        if FOLD in self.passes and isinstance(node.expression, Num):
+            self.stats[FOLD] += 1
+            return _constant(UNARY_OPERATORS[node.op](node.expression.value))
+        if IDENTITY in self.passes and node.op == TokenType.PLUS and self._is_numeric(node.expression):
+            self.stats[IDENTITY] += 1
+            return node.expression
+        return node
+
+    def visit_Assign(self, node):
+        node.right = self.visit(node.right)
+        return node
+
+    def visit_Repeat(self, node):
+        node.count = self.visit(node.count)
+        node.children = self._statements(node.children)
+        return node
+
+    def visit_Each(self, node):
+        node.iterable = self.visit(node.iterable)
+        node.children = self._statements(node.children)
+        return node
+
+    def visit_Import(self, node):
+        return node
+
+    def visit_Collect(self, node):
+        node.expression = self.visit(node.expression)
+        return node
+
+    def visit_While(self, node):
+        node.comparison = self.visit(node.comparison)
+        if PRUNE in self.passes and _is_constant(node.comparison) and not node.comparison.value:
+            self.stats[PRUNE] += 1
+            return None
+        node.children = self._statements(node.children)
+        return node
+
+    def visit_DefineFunction(self, node):
+        node.children = self._statements(node.children)
+        node.return_statement = self.visit(node.return_statement)
+        return node
+
+    def visit_Conditional(self, node):
+        for case in node.cases:
+            case.comparison = self.visit(case.comparison)
+            case.children = self._statements(case.children)
+        if node.else_case is not None:
+            node.else_case.children = self._statements(node.else_case.children)
+
+        if PRUNE not in self.passes:
+            return node
+
+        cases = []
+        for case in node.cases:
+            if not _is_constant(case.comparison):
+                cases.append(case)
+            elif case.comparison.value:
+                # always taken, later cases and the else case are unreachable
+                self.stats[PRUNE] += 1
+                case.comparison = None
+                node.else_case = case
+                break
+            else:
+                self.stats[PRUNE] += 1
+        node.cases = cases
+
+        if not node.cases:
+            return node.else_case.children if node.else_case is not None else None
+        return node
+
+    # functions which are never called from reachable code
+    def _remove_dead_functions(self, tree):
+        # imported modules may call back any function of the program
+        if any(isinstance(child, Import) for child in walk(tree)):
+            return
+
+        definitions = {}
+        for child in tree.children:
+            if isinstance(child, DefineFunction):
+                definitions.setdefault(child.name.text, []).append(child)
+
+        live = set()
+        pending = [child for child in tree.children if not isinstance(child, DefineFunction)]
+        while pending:
+            for name in _called_functions(pending.pop()):
+                if name not in live:
+                    live.add(name)
+                    pending.extend(definitions.get(name, ()))
+
+        children = []
+        for child in tree.children:
+            if isinstance(child, DefineFunction) and child.name.text not in live:
+                self.stats[DEAD_FUNCTIONS] += 1
+            else:
+                children.append(child)
+        tree.children = children
+
+
+# names of all functions called anywhere inside node
+def _called_functions(node):
+    return {child.name for child in walk(node) if isinstance(child, CallFunction)}
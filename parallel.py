@@ -0,0 +1,38 @@
+import itertools
+import os
+import random
+import sys
+
+# chunks handed out per worker, smaller chunks even out iterations of different cost
+CHUNKS_PER_WORKER = 4
+
+
+# consecutive slices of the items, at most count of them
+def split(items, count):
+    size = -(-len(items) // count)
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+# process pool running the iterations of peach loops, the processes are started
+# by the first loop and kept for the following ones until close
+class WorkerPool:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+
+    # function(argument, chunk) for consecutive chunks of the items, the results are yielded in order
+    def map_chunks(self, function, argument, items):
+        # forked workers would print what is still buffered a second time
+        sys.stdout.flush()
+        if self._executor is None:
+            # imported by the first loop, most programs never start a worker
+            import concurrent.futures
+            # workers get their own random state instead of a copy of this process's
+            self._executor = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=random.seed)
+        chunks = split(items, self.workers * CHUNKS_PER_WORKER)
+        return self._executor.map(function, itertools.repeat(argument, len(chunks)), chunks)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -1,131 +1,279 @@
 from token_types import TokenType
+import os
 import sys
 
+# methods which never change their receiver
+PURE_METHODS = {
+    "capitalize", "count", "endswith", "find", "index", "isalpha", "isdigit", "isspace",
+    "lower", "lstrip", "replace", "rfind", "rstrip", "startswith", "strip", "title", "upper",
+}
 
-# ASTs for interpreter
+# ASTs for interpreter, nodes use __slots__ and don't keep their tokens
+# so large programs stay small in memory, operators are stored as TokenType
 
 class AST:
-    pass
+    __slots__ = ()
+
+    # slots holding runtime state like inline caches, they are not pickled
+    _transient = ()
+
+    def __getstate__(self):
+        state = {}
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                if hasattr(self, name):
+                    state[name] = None if name in self._transient else getattr(self, name)
+        return None, state
 
 
 class BinOp(AST):
+    __slots__ = ("left", "op", "right")
+
     def __init__(self, left, op, right):
         self.left = left
         self.right = right
-        self.token = self.op = op
+        self.op = op.type
+
+
+# nodes below are specialized by the type inference, they have no slots of their own
+# so the class of a node can be swapped in place, visitors without a visit method
+# for them visit them like their base class
+
+# operands have proven types, the operator can be applied without dispatch
+class TypedBinOp(BinOp):
+    __slots__ = ()
 
 
 class Statements(AST):
+    __slots__ = ("children", "line")
+
     def __init__(self):
         self.children = []
+        # source line of statements, set by the parser
+        self.line = None
 
 
 class CallMethod(AST):
+    __slots__ = ("object_called", "method_called", "cache", "line")
+    _transient = ("cache",)
+
     def __init__(self, object_called, method_called):
         self.object_called = object_called
         self.method_called = method_called
+        self.line = None
+        # inline cache of the interpreter: (receiver type, unbound method)
+        self.cache = None
 
 
 class DefineFunction(Statements):
+    __slots__ = ("name", "parameters", "return_statement", "frame_size", "memo")
+
     def __init__(self, name):
         super().__init__()
         self.name = name
         self.parameters = []
         self.return_statement = None
+        # set by the resolver
+        self.frame_size = 0
+        # True for memo, False for nomemo, None lets the interpreter decide
+        self.memo = None
 
 
 class CallFunction(AST):
+    __slots__ = ("name", "parameters", "cache", "line")
+    _transient = ("cache",)
+
     def __init__(self, name):
         self.name = name
         self.parameters = []
+        self.line = None
+        # inline cache of the interpreter: (interpreter, function version, target, user function)
+        self.cache = None
 
 
 class CallArray(AST):
+    __slots__ = ("name", "index", "slot")
+
     def __init__(self, name):
         self.name = name
         self.index = 0
+        self.slot = None
+
+
+# the index is a proven integer
+class IntCallArray(CallArray):
+    __slots__ = ()
 
 
 class Program(Statements):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
 
 class Repeat(Statements):
+    __slots__ = ("count",)
+
     def __init__(self, count):
         super().__init__()
         self.count = count
 
 
+# the count is a proven integer
+class IntRepeat(Repeat):
+    __slots__ = ()
+
+
 class While(Statements):
+    __slots__ = ("comparison",)
+
     def __init__(self, comparison):
         super().__init__()
         self.comparison = comparison
 
 
 class Each(Statements):
+    __slots__ = ("iterator", "iterable")
+
     def __init__(self, iterator, iterable):
         super().__init__()
         self.iterator = iterator
         self.iterable = iterable
 
 
+# each loop whose iterations run in worker processes, the values of collect statements
+# are gathered in the order of the items into the target array
+class ParallelEach(Each):
+    __slots__ = ("target",)
+
+    def __init__(self, iterator, iterable, target):
+        super().__init__(iterator, iterable)
+        # Var of the results, None if nothing is collected
+        self.target = target
+
+
+class Collect(AST):
+    __slots__ = ("expression", "line")
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.line = None
+
+
+class Import(AST):
+    __slots__ = ("path", "line")
+
+    def __init__(self, path):
+        self.path = path
+        self.line = None
+
+
 class Conditional(AST):
+    __slots__ = ("cases", "else_case", "line")
+
     def __init__(self):
         self.cases = []
         self.else_case = None
+        self.line = None
 
 
 class If(AST):
+    __slots__ = ("comparison", "children")
+
     def __init__(self, comparison):
         self.comparison = comparison
         self.children = []
 
 
 class UnaryOp(AST):
+    __slots__ = ("op", "expression")
+
     def __init__(self, op, expression):
-        self.token = self.op = op
+        self.op = op.type
         self.expression = expression
 
 
 class Assign(AST):
+    __slots__ = ("left", "op", "right", "line")
+
     def __init__(self, left, op, right):
         self.left = left
         self.right = right
-        self.token = self.op = op
+        self.op = op.type
+        self.line = None
+
+
+# compound assignment of a variable with a proven numeric type,
+# ++ and -- get the constant 1 as right side
+class TypedAssign(Assign):
+    __slots__ = ()
+
+
+# x += value or x = x + value, the interpreter appends strings to a string builder
+class AppendAssign(Assign):
+    __slots__ = ()
 
 
 class Var(AST):
+    __slots__ = ("value", "slot")
+
     def __init__(self, token):
-        self.token = token
         self.value = token.text
+        # set by the resolver
+        self.slot = None
 
 
 class Num(AST):
+    __slots__ = ("value",)
+
     def __init__(self, token):
-        self.token = token
-        self.value = float(token.text)
+        # literals without a decimal point are exact integers
+        self.value = float(token.text) if "." in token.text else int(token.text)
 
 
 class Array(Statements):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
 
 class String(AST):
+    __slots__ = ("value",)
+
     def __init__(self, token):
-        self.token = token
         self.value = token.text
 
 
+# all nodes below and including node, lists of nodes are walked as well
+def walk(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, AST):
+            yield node
+            children = []
+            for cls in type(node).__mro__:
+                for name in cls.__dict__.get("__slots__", ()):
+                    value = getattr(node, name, None)
+                    if isinstance(value, (AST, list)):
+                        children.append(value)
+            stack.extend(reversed(children))
+
+
 class Parser:
-    def __init__(self, lexer):
+    # directory is where the source is, imported paths are relative to it
+    # or to the working directory if it isn't known
+    def __init__(self, lexer, directory=None):
         self.lexer = lexer
+        self.directory = directory
 
         self.symbols = set()
-
-        self.tokens = []
-        self.tree = []
+        # targets of the peach loops around the statement being parsed, None for a loop without into
+        self.peach_targets = []
 
         self.current_token = None
         self.peek_token = None
@@ -159,8 +307,6 @@ class Parser:
     def next_token(self):
         self.current_token = self.peek_token
         self.peek_token = self.lexer.get_token()
-        if self.current_token is not None:
-            self.tokens.append(self.current_token)
 
     # raise Exception
     def _abort(self, message):
@@ -168,14 +314,19 @@ class Parser:
 
     def program(self):
         node = Program()
+        for statement in self.statements():
+            node.children.append(statement)
+        return node
+
+    # generate the top level statements one by one as soon as they are parsed
+    def statements(self):
         # ignore newline at start
         while self.check_token(TokenType.NEWLINE):
             self.next_token()
 
         # parse all statements until file end
         while not self.check_token(TokenType.EOF):
-            node.children.append(self.statement())
-        return node
+            yield self.statement()
 
     def nl(self):
         #print("NEWLINE")
@@ -407,6 +558,76 @@ class Parser:
         self._match(TokenType.END)
         return node
 
+    def statement_peach(self):
+        self.next_token()
+        iterator = self.variable()
+        self._match(TokenType.IN)
+        iterable = self.primary()
+        target = None
+        if self.check_token(TokenType.INTO):
+            self.next_token()
+            target = self.current_token
+            self._match(TokenType.IDENT)
+        self._match(TokenType.THEN)
+
+        # variables declared in the body belong to a single iteration
+        outer = set(self.symbols)
+        self.symbols.add(iterator.value)
+        node = ParallelEach(iterator, iterable, None)
+        self.nl()
+
+        self.peach_targets.append(target.text if target is not None else None)
+        while not self.check_token(TokenType.END):
+            node.children.append(self.statement())
+        self._match(TokenType.END)
+        self.peach_targets.pop()
+
+        local = set(self.symbols) - outer
+        self._check_peach_body(node, local | {iterator.value}, local - {iterator.value}, target, outer - {iterator.value})
+        # they can't be read after the loop, their values stayed in the workers
+        for name in local:
+            self.symbols.discard(name)
+        if target is not None:
+            self.symbols.add(target.text)
+            node.target = Var(target)
+        return node
+
+    # iterations run in parallel, so the body may only write the variables it declares,
+    # loops nested in the body write their iterator and peach loops their target as well
+    def _check_peach_body(self, node, writable, mutable, target, shared):
+        for child in walk(node.children):
+            if isinstance(child, DefineFunction):
+                self._abort("Functions can't be defined in the body of peach")
+            if isinstance(child, Assign) and child.left.value not in writable:
+                self._abort("The body of peach can't assign the shared variable " + child.left.value)
+            if isinstance(child, Each) and child.iterator.value in shared:
+                self._abort("The body of peach can't loop over the shared variable " + child.iterator.value)
+            if isinstance(child, ParallelEach) and child.target is not None and child.target.value in shared:
+                self._abort("The body of peach can't collect into the shared variable " + child.target.value)
+            if isinstance(child, CallMethod) and child.object_called.value not in mutable \
+                    and child.method_called.name not in PURE_METHODS:
+                self._abort("The body of peach can't call " + child.method_called.name + " of the shared variable "
+                            + child.object_called.value)
+            if target is not None and (isinstance(child, Var) and child.value == target.text
+                                       or isinstance(child, CallArray) and child.name == target.text):
+                self._abort("The body of peach can't read its results " + target.text)
+
+    def statement_collect(self):
+        if not self.peach_targets:
+            self._abort("collect outside of peach")
+        if self.peach_targets[-1] is None:
+            self._abort("collect in a peach without into")
+        self.next_token()
+        return Collect(self.expression())
+
+    def statement_import(self):
+        self.next_token()
+        path = self.current_token.text
+        self._match(TokenType.STRING)
+        if self.directory is not None:
+            path = os.path.abspath(os.path.join(self.directory, path))
+        return Import(path)
+
     def statement_while(self):
         #print("STATEMENT-WHILE")
 
@@ -440,13 +661,14 @@ class Parser:
         self._match(TokenType.THEN)
         self.nl()
         while not self.check_token(TokenType.END):
-            node.children.append(self.statement())
+            # the return statement may also be the only statement
             if self.check_token(TokenType.RETURN):
                 self._match(TokenType.RETURN)
                 value = self.expression()
                 self._match(TokenType.NEWLINE)
                 node.return_statement = value
                 break
+            node.children.append(self.statement())
         self._match(TokenType.END)
         return node
 
@@ -479,6 +701,7 @@ class Parser:
     # parse all statements
     def statement(self):
         #print(self.current_token.type, self.current_token.text, "statement")
+        line = self.current_token.line
         if self.check_token(TokenType.IF):
             node = self.statement_if()
 
@@ -492,11 +715,25 @@ class Parser:
             node = self.statement_while()
         elif self.check_token(TokenType.EACH):
             node = self.statement_each()
+        elif self.check_token(TokenType.PEACH):
+            node = self.statement_peach()
+        elif self.check_token(TokenType.COLLECT):
+            node = self.statement_collect()
+        elif self.check_token(TokenType.IMPORT):
+            node = self.statement_import()
         elif self.check_token(TokenType.FUNCTION_DEFINE):
             node = self.statement_function()
+        elif self.check_token(TokenType.MEMO) or self.check_token(TokenType.NOMEMO):
+            memo = self.check_token(TokenType.MEMO)
+            self.next_token()
+            if not self.check_token(TokenType.FUNCTION_DEFINE):
+                self._abort("Expected func after memo or nomemo, got " + self.current_token.text)
+            node = self.statement_function()
+            node.memo = memo
         elif self.check_token(TokenType.IDENT):
             node = self.statement_ident()
         else:
             self._abort("Invalid statement at " + self.current_token.text + " (" + self.current_token.type.name + ")")
+        node.line = line
         self.nl()
         return node
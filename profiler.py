@@ -0,0 +1,147 @@
+import os
+import time
+from interpreter import Interpreter
+from modules import module_cache
+from parse import Import, walk
+
+# name of the top level code in reports and stacks
+TOP_LEVEL = "<program>"
+
+
+# timings of a source line or a user function, total time counts recursive entries once
+class Timing:
+    __slots__ = ("hits", "total", "own", "active")
+
+    def __init__(self):
+        self.hits = 0
+        self.total = 0
+        # time not spent in called user functions, only used for functions
+        self.own = 0
+        # entries which haven't returned yet
+        self.active = 0
+
+
+# tree interpreter measuring wall time and hit counts of every statement and user function,
+# the plain Interpreter has no profiling code at all
+class ProfilingInterpreter(Interpreter):
+
+    def __init__(self, parser=None, **options):
+        # peach loops run in this process, so the lines of their bodies are timed as well
+        options.setdefault("workers", 1)
+        super().__init__(parser, **options)
+        self.clock = time.perf_counter_ns
+        # (path of the module or None for the program, line) -> Timing
+        self.lines = {}
+        # id of a node of an imported module -> path of the module
+        self.paths = {}
+        # function name -> Timing
+        self.function_timings = {}
+        # self time in nanoseconds of every stack of function names, for flame graphs
+        self.stacks = {}
+        # [name, start, time spent in callees] of the running functions
+        self._call_stack = [[TOP_LEVEL, 0, 0]]
+
+    def visit(self, node):
+        line = getattr(node, "line", None)
+        if line is None:
+            return super().visit(node)
+
+        key = self.paths.get(id(node)), line
+        timing = self.lines.get(key)
+        if timing is None:
+            timing = self.lines[key] = Timing()
+        timing.hits += 1
+        timing.active += 1
+        start = self.clock()
+        try:
+            return super().visit(node)
+        finally:
+            timing.active -= 1
+            if not timing.active:
+                timing.total += self.clock() - start
+
+    def visit_Import(self, node):
+        super().visit_Import(node)
+        self._register(node.path, set())
+
+    # remember which module the nodes of its functions come from, modules stay cached so the ids stay valid
+    def _register(self, path, visited):
+        module = module_cache.load(path)
+        visited.add(module.path)
+        for statement in module.statements:
+            if isinstance(statement, Import):
+                if os.path.abspath(statement.path) not in visited:
+                    self._register(statement.path, visited)
+            else:
+                for child in walk(statement):
+                    self.paths[id(child)] = module.path
+
+    def _call_function(self, func, arguments):
+        name = func.name.text
+        timing = self.function_timings.get(name)
+        if timing is None:
+            timing = self.function_timings[name] = Timing()
+        timing.hits += 1
+        timing.active += 1
+        entry = [name, self.clock(), 0]
+        self._call_stack.append(entry)
+        try:
+            return super()._call_function(func, arguments)
+        finally:
+            elapsed = self.clock() - entry[1]
+            self._call_stack.pop()
+            self._call_stack[-1][2] += elapsed
+            own = elapsed - entry[2]
+            timing.own += own
+            timing.active -= 1
+            if not timing.active:
+                timing.total += elapsed
+            stack = ";".join(frame[0] for frame in self._call_stack) + ";" + name
+            self.stacks[stack] = self.stacks.get(stack, 0) + own
+
+    def interpret(self, tree=None):
+        top = self._call_stack[0]
+        top[1], top[2] = self.clock(), 0
+        try:
+            return super().interpret(tree)
+        finally:
+            own = self.clock() - top[1] - top[2]
+            self.stacks[TOP_LEVEL] = self.stacks.get(TOP_LEVEL, 0) + own
+
+    # text report of the lines and functions, the slowest first, path is the file of the program,
+    # the files of imported modules are shown relative to it
+    def report(self, source_lines=(), limit=None, path=None):
+        directory = os.path.dirname(os.path.abspath(path)) if path is not None else None
+        sources = {None: source_lines}
+        out = ["{:<20} {:>6} {:>10} {:>12} {:>10}  {}".format("file", "line", "hits", "total ms", "per hit us", "source")]
+        lines = sorted(self.lines.items(), key=lambda item: item[1].total, reverse=True)
+        for (module, line), timing in lines[:limit]:
+            if module not in sources:
+                sources[module] = _read_lines(module)
+            source = sources[module][line - 1].strip() if line <= len(sources[module]) else ""
+            if module is None:
+                name = os.path.basename(path) if path is not None else TOP_LEVEL
+            else:
+                name = os.path.relpath(module, directory) if directory is not None else module
+            out.append("{:<20} {:>6} {:>10} {:>12.3f} {:>10.2f}  {}".format(
+                name, line, timing.hits, timing.total / 1e6, timing.total / timing.hits / 1e3, source))
+
+        out.append("")
+        out.append("{:<20} {:>10} {:>12} {:>12}".format("function", "calls", "total ms", "own ms"))
+        functions = sorted(self.function_timings.items(), key=lambda item: item[1].total, reverse=True)
+        for name, timing in functions[:limit]:
+            out.append("{:<20} {:>10} {:>12.3f} {:>12.3f}".format(name, timing.hits, timing.total / 1e6, timing.own / 1e6))
+        return "\n".join(out) + "\n"
+
+    # one "stack;of;functions microseconds" line per stack, the input of flamegraph.pl and speedscope
+    def collapsed_stacks(self):
+        return "".join("{} {}\n".format(stack, nanoseconds // 1000)
+                       for stack, nanoseconds in sorted(self.stacks.items()) if nanoseconds >= 1000)
+
+
+def _read_lines(path):
+    try:
+        with open(path, "r") as file:
+            return file.read().splitlines()
+    except OSError:
+        return []
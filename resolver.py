@@ -0,0 +1,119 @@
+from token_types import TokenType
+from visitor import NodeVisitor
+from parse import Assign, AppendAssign, BinOp, Var
+
+
+# Resolver giving every variable a fixed slot index in the frame of its scope,
+# top level code uses the global frame, every function body its own frame
+class Resolver(NodeVisitor):
+    def __init__(self):
+        # name -> slot of the global frame, grows while statements are resolved
+        self.globals = {}
+        self.scope = self.globals
+
+    def resolve(self, tree):
+        self.visit(tree)
+        return len(self.globals)
+
+    def _slot(self, name):
+        if name not in self.scope:
+            self.scope[name] = len(self.scope)
+        return self.scope[name]
+
+    def _block(self, children):
+        for child in children:
+            self.visit(child)
+
+    def visit_Program(self, node):
+        self._block(node.children)
+
+    def visit_Num(self, node):
+        pass
+
+    def visit_String(self, node):
+        pass
+
+    def visit_NoneType(self, node):
+        pass
+
+    def visit_Var(self, node):
+        node.slot = self._slot(node.value)
+
+    def visit_Array(self, node):
+        self._block(node.children)
+
+    def visit_CallArray(self, node):
+        # arrays are always read from the global frame
+        if node.name not in self.globals:
+            self.globals[node.name] = len(self.globals)
+        node.slot = self.globals[node.name]
+        self.visit(node.index)
+
+    def visit_BinOp(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+
+    def visit_UnaryOp(self, node):
+        self.visit(node.expression)
+
+    def visit_CallFunction(self, node):
+        self._block(node.parameters)
+
+    def visit_CallMethod(self, node):
+        self.visit(node.object_called)
+        self._block(node.method_called.parameters)
+
+    def visit_Assign(self, node):
+        self.visit(node.right)
+        self.visit(node.left)
+        if type(node) is Assign and _is_append(node):
+            node.__class__ = AppendAssign
+
+    def visit_Conditional(self, node):
+        for case in node.cases:
+            self.visit(case.comparison)
+            self._block(case.children)
+        if node.else_case is not None:
+            self._block(node.else_case.children)
+
+    def visit_While(self, node):
+        self.visit(node.comparison)
+        self._block(node.children)
+
+    def visit_Repeat(self, node):
+        self.visit(node.count)
+        self._block(node.children)
+
+    def visit_Each(self, node):
+        self.visit(node.iterable)
+        self.visit(node.iterator)
+        self._block(node.children)
+
+    def visit_ParallelEach(self, node):
+        self.visit_Each(node)
+        if node.target is not None:
+            self.visit(node.target)
+
+    def visit_Collect(self, node):
+        self.visit(node.expression)
+
+    def visit_Import(self, node):
+        pass
+
+    def visit_DefineFunction(self, node):
+        outer, self.scope = self.scope, {}
+        for parameter in node.parameters:
+            self._slot(parameter.text)
+        self._block(node.children)
+        self.visit(node.return_statement)
+        node.frame_size = len(self.scope)
+        self.scope = outer
+
+
+# x += value or x = x + value
+def _is_append(node):
+    if node.op == TokenType.PLUSEQ:
+        return True
+    right = node.right
+    return node.op == TokenType.EQ and isinstance(right, BinOp) and right.op == TokenType.PLUS \
+        and type(right.left) is Var and right.left.value == node.left.value
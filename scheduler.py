@@ -0,0 +1,161 @@
+import argparse
+import builtins
+import collections
+import contextlib
+import io
+import os
+import sys
+import time
+
+from lexer import Lexer
+from parse import Parser, CallMethod, walk
+from compiler import Compiler
+from vm import VirtualMachine
+from batch import collect_scripts
+
+# loop iterations and calls a script runs before the next one gets its turn
+DEFAULT_SLICE = 1000
+
+READY = "ready"
+DONE = "done"
+FAILED = "failed"
+OUT_OF_STEPS = "out of steps"
+OUT_OF_TIME = "out of cpu time"
+
+# python builtins tenants may call, nothing which runs python code, reaches files or modules
+# or gets at the attributes of objects, a single call still runs to its end within one step
+TENANT_BUILTINS = {name: getattr(builtins, name) for name in (
+    "abs", "all", "any", "bool", "chr", "divmod", "enumerate", "float", "input", "int", "len", "list",
+    "max", "min", "ord", "print", "repr", "reversed", "round", "sorted", "str", "sum", "tuple", "zip",
+)}
+
+
+# a script run by the scheduler, it has its own vm, output and input
+class Tenant:
+    def __init__(self, name, vm, step_budget=None, cpu_budget=None, stdin=""):
+        self.name = name
+        self.vm = vm
+        self.step_budget = step_budget
+        self.cpu_budget = cpu_budget
+        self.stdin = io.StringIO(stdin)
+        self.stdout = io.StringIO()
+        self.status = READY
+        self.error = None
+        self.cpu_time = 0.0
+        self.slices = 0
+
+    @property
+    def steps(self):
+        return self.vm.steps
+
+    @property
+    def steps_per_sec(self):
+        return self.steps / self.cpu_time if self.cpu_time else 0.0
+
+
+# runs many scripts in one thread, every script gets slices of a fixed number of steps in turn,
+# so an endless loop only slows the others down and is stopped by its budget
+class Scheduler:
+    def __init__(self, slice_steps=DEFAULT_SLICE):
+        self.slice_steps = slice_steps
+        self.tenants = []
+        self._ready = collections.deque()
+
+    # add a script from its source, step_budget limits loop iterations and calls,
+    # cpu_budget the cpu seconds, stdin is what input() reads, imports are relative to directory.
+    # scripts may be untrusted, they only get TENANT_BUILTINS and can't call methods starting with _
+    def add(self, name, source, step_budget=None, cpu_budget=None, stdin="", directory=None):
+        vm = VirtualMachine(python_builtins=TENANT_BUILTINS)
+        tenant = Tenant(name, vm, step_budget, cpu_budget, stdin)
+        self.tenants.append(tenant)
+        try:
+            tree = Parser(Lexer(source), directory).parse()
+            for node in walk(tree):
+                if isinstance(node, CallMethod) and node.method_called.name.startswith("_"):
+                    raise Exception("Calling private method: " + node.method_called.name)
+            vm.start(Compiler().compile(tree))
+        except Exception as exception:
+            self._fail(tenant, exception)
+            return tenant
+        self._ready.append(tenant)
+        return tenant
+
+    def _fail(self, tenant, exception):
+        tenant.status = FAILED
+        tenant.error = "{}: {}".format(type(exception).__name__, exception)
+
+    # give the tenant one slice, returns whether it can go on
+    def _run_slice(self, tenant):
+        steps = self.slice_steps
+        if tenant.step_budget is not None:
+            steps = min(steps, tenant.step_budget - tenant.steps)
+            if steps <= 0:
+                tenant.status = OUT_OF_STEPS
+                return False
+
+        stdin, sys.stdin = sys.stdin, tenant.stdin
+        start = time.process_time()
+        try:
+            with contextlib.redirect_stdout(tenant.stdout):
+                finished = tenant.vm.run(steps)
+        except Exception as exception:
+            self._fail(tenant, exception)
+            return False
+        finally:
+            tenant.cpu_time += time.process_time() - start
+            tenant.slices += 1
+            sys.stdin = stdin
+
+        if finished:
+            tenant.status = DONE
+        elif tenant.step_budget is not None and tenant.steps >= tenant.step_budget:
+            tenant.status = OUT_OF_STEPS
+        elif tenant.cpu_budget is not None and tenant.cpu_time >= tenant.cpu_budget:
+            tenant.status = OUT_OF_TIME
+        return tenant.status == READY
+
+    # run round robin until every tenant is done, failed or out of budget
+    def run(self):
+        ready = self._ready
+        while ready:
+            tenant = ready.popleft()
+            if self._run_slice(tenant):
+                ready.append(tenant)
+        return self.tenants
+
+    def report(self):
+        out = ["{:<30} {:<16} {:>12} {:>10} {:>14}".format("script", "status", "steps", "cpu ms", "steps/sec")]
+        for tenant in self.tenants:
+            out.append("{:<30} {:<16} {:>12} {:>10.1f} {:>14.0f}".format(
+                tenant.name, tenant.status, tenant.steps, tenant.cpu_time * 1000, tenant.steps_per_sec))
+            if tenant.error:
+                out.append("    " + tenant.error)
+        return "\n".join(out) + "\n"
+
+
+def main(argv):
+    arguments = argparse.ArgumentParser(prog="create.py schedule",
+                                        description="Run many create scripts interleaved in one process on the vm.")
+    arguments.add_argument("target", help="directory or glob pattern of scripts")
+    arguments.add_argument("--slice", type=int, default=DEFAULT_SLICE, help="steps of a time slice (default: 1000)")
+    arguments.add_argument("--step-budget", type=int, help="steps a script may run at most")
+    arguments.add_argument("--cpu-budget", type=float, help="cpu seconds a script may use at most")
+    arguments.add_argument("--show-output", action="store_true", help="print the output of every script")
+    args = arguments.parse_args(argv)
+
+    paths = collect_scripts(args.target)
+    if not paths:
+        sys.exit("Error: No scripts found for " + args.target)
+
+    scheduler = Scheduler(args.slice)
+    for path in paths:
+        with open(path, "r") as file:
+            scheduler.add(path, file.read(), args.step_budget, args.cpu_budget, directory=os.path.dirname(path))
+    scheduler.run()
+
+    print(scheduler.report(), end="")
+    if args.show_output:
+        for tenant in scheduler.tenants:
+            print("--- " + tenant.name)
+            print(tenant.stdout.getvalue(), end="")
+    return 0 if all(tenant.status == DONE for tenant in scheduler.tenants) else 1
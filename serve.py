@@ -0,0 +1,294 @@
+import argparse
+import collections
+import io
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+import embed
+from batch import available_cores
+from client import REQUEST, OUTPUT, ERROR, EXIT, send_frame, receive_frame
+
+# requests a worker serves before it is replaced by a fresh process
+DEFAULT_MAX_REQUESTS = 1000
+# compiled programs kept by every worker
+PROGRAM_CACHE_SIZE = 128
+# output of a script is sent to the client in chunks of this many characters
+OUTPUT_CHUNK = 64 * 1024
+
+# exit status of requests the daemon couldn't run, like sysexits.h
+STATUS_ERROR = 1
+STATUS_BUSY = 75
+STATUS_TIMEOUT = 124
+
+
+# stdout of a script run by a worker, the output is sent to the daemon in chunks while the script runs
+class _OutputStream(io.TextIOBase):
+    def __init__(self, connection):
+        self.connection = connection
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= OUTPUT_CHUNK:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.parts:
+            self.connection.send((OUTPUT, "".join(self.parts)))
+            self.parts.clear()
+            self.size = 0
+
+
+# parsed programs of a worker, a program is compiled again when its file changes
+class _ProgramCache:
+    def __init__(self, size=PROGRAM_CACHE_SIZE):
+        self.size = size
+        # path -> (modification time, CompiledProgram)
+        self.programs = collections.OrderedDict()
+
+    def get(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        entry = self.programs.get(path)
+        if entry is None or entry[0] != mtime:
+            with open(path, "r") as file:
+                entry = self.programs[path] = (mtime, embed.compile(file.read(), directory=os.path.dirname(path)))
+            if len(self.programs) > self.size:
+                self.programs.popitem(last=False)
+        self.programs.move_to_end(path)
+        return entry[1]
+
+
+# exit status of exit(code) like python computes it, other codes are printed as error
+def _exit_status(code, stdout, connection):
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    stdout.flush()
+    connection.send((ERROR, str(code)))
+    return STATUS_ERROR
+
+
+# main loop of a worker process, runs one script per (path, stdin) request until it gets None
+def _work(connection):
+    # the daemon stops the workers, ctrl-c in its terminal shouldn't kill them half way
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # recycled workers are forked after the daemon installed its own handler
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    programs = _ProgramCache()
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        path, stdin = request
+        stdout = _OutputStream(connection)
+        sys.stdin = io.StringIO(stdin)
+        # the prompts of input() are written to sys.stdout
+        outer, sys.stdout = sys.stdout, stdout
+        status = 0
+        try:
+            programs.get(path).run(stdout=stdout)
+        except SystemExit as exception:
+            # exit() of the script ends the request, not the worker
+            status = _exit_status(exception.code, stdout, connection)
+        except Exception as exception:
+            stdout.flush()
+            connection.send((ERROR, "{}: {}".format(type(exception).__name__, exception)))
+            status = STATUS_ERROR
+        finally:
+            sys.stdout = outer
+        stdout.flush()
+        connection.send((EXIT, status))
+
+
+# a warm worker process and the daemon's end of its pipe
+class Worker:
+    def __init__(self):
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_work, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.requests = 0
+
+    # message of the running script, None if there is none before the deadline
+    def receive(self, deadline):
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not self.connection.poll(timeout):
+            return None
+        return self.connection.recv()
+
+    # let the worker finish its loop, kill it if it doesn't
+    def stop(self, timeout=1.0):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+# pool of warm workers, at most one script runs in a worker at a time and at most
+# max_pending requests wait for a worker, workers are replaced after max_requests scripts
+class WorkerPool:
+    def __init__(self, workers, max_requests=DEFAULT_MAX_REQUESTS, max_pending=None, timeout=None):
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self.idle = queue.Queue()
+        self.workers = [Worker() for _ in range(workers)]
+        for worker in self.workers:
+            self.idle.put(worker)
+        self._slots = threading.BoundedSemaphore(workers + (max_pending if max_pending is not None else 4 * workers))
+        self._lock = threading.Lock()
+        self.served = 0
+        self.recycled = 0
+
+    # stop the worker and put a fresh one in its place, runs in the background
+    # so the request which used the worker last doesn't wait for it
+    def _recycle(self, worker, kill):
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+        replacement = Worker()
+        with self._lock:
+            self.workers[self.workers.index(worker)] = replacement
+            self.recycled += 1
+        self.idle.put(replacement)
+
+    # run the script in a worker, send(kind, payload) gets the output while it arrives,
+    # returns the exit status
+    def run(self, path, stdin, send):
+        if not self._slots.acquire(blocking=False):
+            send(ERROR, "daemon busy, try again later")
+            return STATUS_BUSY
+        try:
+            worker = self.idle.get()
+            status, healthy = self._run_in(worker, path, stdin, send)
+            worker.requests += 1
+            with self._lock:
+                self.served += 1
+            if not healthy or worker.requests >= self.max_requests:
+                threading.Thread(target=self._recycle, args=(worker, not healthy), daemon=True).start()
+            else:
+                self.idle.put(worker)
+            return status
+        finally:
+            self._slots.release()
+
+    # returns the exit status and whether the worker can run the next script
+    def _run_in(self, worker, path, stdin, send):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        try:
+            worker.connection.send((path, stdin))
+            while True:
+                message = worker.receive(deadline)
+                if message is None:
+                    send(ERROR, "script timed out after {} seconds".format(self.timeout))
+                    return STATUS_TIMEOUT, False
+                kind, payload = message
+                if kind == EXIT:
+                    return payload, True
+                send(kind, payload)
+        except (OSError, EOFError):
+            send(ERROR, "worker crashed")
+            return STATUS_ERROR, False
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            kind, payload = receive_frame(self.request)
+        except (OSError, EOFError):
+            return
+        if kind != REQUEST:
+            return
+        request = json.loads(payload)
+        client = {"open": True}
+
+        # a client which went away doesn't stop the script, the rest of its output is dropped
+        def send(kind, payload):
+            if not client["open"]:
+                return
+            try:
+                send_frame(self.request, kind, payload.encode("utf-8"))
+            except OSError:
+                client["open"] = False
+
+        status = self.server.pool.run(request["path"], request.get("stdin", ""), send)
+        send(EXIT, str(status))
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, pool):
+        self.pool = pool
+        super().__init__(path, _Handler)
+
+
+# remove the socket file of a daemon which is gone, fails if one is still listening
+def _claim_socket(path):
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+            return
+    sys.exit("Error: a daemon is already serving on " + path)
+
+
+def main(argv):
+    arguments = argparse.ArgumentParser(prog="create.py serve",
+                                        description="Run scripts sent by client.py in warm worker processes.")
+    arguments.add_argument("--socket", required=True, help="path of the unix socket to listen on")
+    arguments.add_argument("--workers", type=int, default=None, help="number of worker processes (default: all cores)")
+    arguments.add_argument("--max-requests", type=int, default=DEFAULT_MAX_REQUESTS,
+                           help="scripts a worker runs before it is replaced (default: 1000)")
+    arguments.add_argument("--max-pending", type=int, help="requests waiting for a worker before new ones are refused "
+                                                           "(default: 4 per worker)")
+    arguments.add_argument("--timeout", type=float, help="seconds a script may run before its worker is killed")
+    args = arguments.parse_args(argv)
+
+    _claim_socket(args.socket)
+    pool = WorkerPool(args.workers or available_cores(), args.max_requests, args.max_pending, args.timeout)
+    server = Server(args.socket, pool)
+    # SIGTERM shuts down like ctrl-c
+    signal.signal(signal.SIGTERM, lambda number, frame: _interrupt())
+    print("serving on {} with {} workers".format(args.socket, len(pool.workers)), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+        pool.close()
+        print("served {} scripts, {} workers recycled".format(pool.served, pool.recycled), file=sys.stderr)
+    return 0
+
+
+def _interrupt():
+    raise KeyboardInterrupt
@@ -0,0 +1,24 @@
+# appended pieces joined into one chunk at a time, every character is copied twice at most
+PIECES_PER_CHUNK = 256
+
+
+# string value of a variable which is appended to, the interpreter joins it into a str
+# when the variable is read, so growing a string in a loop takes linear time
+class StringBuilder:
+    __slots__ = ("chunks", "pieces")
+
+    def __init__(self, text):
+        self.chunks = [text]
+        self.pieces = []
+
+    def append(self, text):
+        pieces = self.pieces
+        pieces.append(text)
+        if len(pieces) >= PIECES_PER_CHUNK:
+            self.chunks.append("".join(pieces))
+            pieces.clear()
+
+    def __str__(self):
+        self.chunks.extend(self.pieces)
+        self.pieces.clear()
+        return "".join(self.chunks)
@@ -0,0 +1,63 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import batch
+from interpreter import Interpreter
+
+
+# tree walker killing its worker process when the script defines a global named crash
+class CrashingInterpreter(Interpreter):
+    def interpret(self, tree):
+        super().interpret(tree)
+        if "crash" in self.globals:
+            os._exit(1)
+
+
+SCRIPTS = {
+    "a_ok.crt": "println(1)\n",
+    "b_error.crt": "println(2)\nprintln(undefined(1))\n",
+    "c_crash.crt": "var crash = 1\n",
+    "d_ok.crt": "var[] xs = [1, 2]\nprintln(xs.count(2))\n",
+}
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        for name, source in SCRIPTS.items():
+            with open(os.path.join(self.directory.name, name), "w") as file:
+                file.write(source)
+        self.paths = batch.collect_scripts(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    # a failing or crashing script doesn't take the results of the others with it
+    def test_isolation(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                results = batch.run_batch(self.paths, CrashingInterpreter, workers=workers)
+                self.assertEqual([os.path.basename(result.path) for result in results], sorted(SCRIPTS))
+                self.assertEqual([result.ok for result in results], [True, False, False, True])
+                self.assertEqual([results[0].stdout, results[1].stdout, results[3].stdout], ["1\n", "2\n", "1\n"])
+                self.assertIn("undefined", results[1].error)
+                self.assertIn("worker crashed", results[2].error)
+
+    def test_main(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            status = batch.main([self.directory.name, "-O", "2", "--workers", "2"], {"tree": CrashingInterpreter})
+        self.assertEqual(status, 1)
+        self.assertIn("4 scripts, 2 failed", stdout.getvalue())
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+            batch.main([self.directory.name, "-O", "3"], {"tree": CrashingInterpreter})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import cache
+import create
+from cache import ProgramCache, CACHE_DIRECTORY, CACHE_SUFFIX
+from optimizer import Optimizer
+
+SOURCE = "var x = 1\nprint(x + 1)\n"
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "program.crt")
+        self.write(SOURCE)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, source):
+        with open(self.path, "w") as file:
+            file.write(source)
+
+    def entries(self):
+        directory = os.path.join(self.directory.name, CACHE_DIRECTORY)
+        return sorted(name for name in os.listdir(directory) if name.endswith(CACHE_SUFFIX))
+
+    # load the program like create.py does, returns the tree and whether it was parsed
+    def load(self, source, optimize=0):
+        with mock.patch.object(create, "Parser", wraps=create.Parser) as parser:
+            tree = create.load_program(self.path, source, True, Optimizer.for_level(optimize))
+        return tree, parser.called
+
+    def test_hit(self):
+        _, parsed = self.load(SOURCE)
+        self.assertTrue(parsed)
+        tree, parsed = self.load(SOURCE)
+        self.assertFalse(parsed)
+        self.assertEqual(len(tree.children), 2)
+        self.assertEqual(len(self.entries()), 1)
+
+    # entries are keyed by the source, touching the file doesn't parse it again but changing it does
+    def test_invalidation(self):
+        self.load(SOURCE)
+        os.utime(self.path, (0, 0))
+        self.assertFalse(self.load(SOURCE)[1])
+        changed = SOURCE + "print(3)\n"
+        self.write(changed)
+        tree, parsed = self.load(changed)
+        self.assertTrue(parsed)
+        self.assertEqual(len(tree.children), 3)
+        # the optimization level is part of the key
+        self.assertTrue(self.load(changed, optimize=1)[1])
+
+    def test_corrupt(self):
+        program_cache = ProgramCache.for_source(self.path)
+        key = program_cache.key(SOURCE)
+        self.load(SOURCE)
+        entry = program_cache._path(key)
+        with open(entry, "r+b") as file:
+            file.seek(cache.HEADER.size)
+            file.write(b"garbage")
+        self.assertIsNone(program_cache.load(key))
+        self.assertFalse(os.path.exists(entry))
+        self.assertTrue(self.load(SOURCE)[1])
+
+    def test_stale_version(self):
+        program_cache = ProgramCache.for_source(self.path)
+        key = program_cache.key(SOURCE)
+        self.assertTrue(program_cache.store(key, "tree"))
+        with mock.patch.object(cache, "INTERPRETER_VERSION", "other"):
+            self.assertIsNone(program_cache.load(program_cache.key(SOURCE)))
+        self.assertEqual(program_cache.load(key), "tree")
+
+    # an unwritable cache only costs parsing again
+    def test_unwritable(self):
+        with open(os.path.join(self.directory.name, CACHE_DIRECTORY), "w") as file:
+            file.write("not a directory")
+        self.assertTrue(self.load(SOURCE)[1])
+        self.assertTrue(self.load(SOURCE)[1])
+
+    def test_full(self):
+        program_cache = ProgramCache.for_source(self.path)
+        with mock.patch("tempfile.mkstemp", side_effect=OSError(28, "No space left on device")):
+            self.assertFalse(program_cache.store(program_cache.key(SOURCE), "tree"))
+            tree, parsed = self.load(SOURCE)
+        self.assertTrue(parsed)
+        self.assertEqual(self.entries(), [])
+
+    def test_eviction(self):
+        program_cache = ProgramCache.for_source(self.path, max_size=1)
+        first, second = program_cache.key("first"), program_cache.key("second")
+        program_cache.store(first, "x" * 100)
+        program_cache.store(second, "y" * 100)
+        self.assertIsNone(program_cache.load(first))
+
+
+if __name__ == "__main__":
+    unittest.main()
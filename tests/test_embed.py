@@ -0,0 +1,66 @@
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import embed
+
+# log is a host function, len shadows a pure python builtin and println writes to the stdout of the run
+SOURCE = """func grade(n) {
+    log(n)
+    return n * 2
+}
+func size(n) {
+    return len(n)
+}
+func echo(n) {
+    println(n)
+    return n
+}
+var a = grade(record)
+var b = grade(record)
+var c = size(record)
+var d = size(record)
+var e = echo(record)
+var f = echo(record)
+"""
+
+
+class EmbedTest(unittest.TestCase):
+    def run_program(self, program, record):
+        calls = []
+        builtins = {
+            "log": calls.append,
+            "len": lambda value: calls.append(("len", value)) or 1,
+        }
+        stdout = io.StringIO()
+        results = program.run(globals={"record": record}, builtins=builtins, stdout=stdout)
+        return results, calls, stdout.getvalue()
+
+    # functions calling host functions aren't memoized, every call reaches the host
+    def test_host_side_effects(self):
+        program = embed.compile(SOURCE, inputs=("record",))
+        for record in (3, 4):
+            results, calls, output = self.run_program(program, record)
+            self.assertEqual((results["a"], results["b"], results["c"]), (record * 2, record * 2, 1))
+            self.assertEqual(calls, [record, record, ("len", record), ("len", record)])
+            self.assertEqual(output, "{0}\n{0}\n".format(record))
+
+    # memo is a promise of the script, results are only reused within one run
+    def test_memo(self):
+        program = embed.compile(SOURCE.replace("func grade", "memo func grade"), inputs=("record",))
+        for _ in range(2):
+            results, calls, _ = self.run_program(program, 3)
+            self.assertEqual((results["a"], results["b"]), (6, 6))
+            self.assertEqual(calls[:2], [3, ("len", 3)])
+
+    def test_unknown_global(self):
+        program = embed.compile(SOURCE, inputs=("record",))
+        with self.assertRaises(Exception):
+            program.run(globals={"missing": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import asyncio
+import contextlib
+import glob
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from parse import Parser
+from optimizer import Optimizer, LEVELS
+from interpreter import Interpreter
+from vm import VirtualMachine
+from closures import ClosureInterpreter
+from transpiler import PythonInterpreter
+from async_interpreter import AsyncInterpreter
+
+PROGRAMS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "programs")
+
+
+def _run_async(tree):
+    asyncio.run(AsyncInterpreter().interpret(tree))
+
+
+# every engine gets the tree and runs it, the tree walker is the reference
+ENGINES = {
+    "tree": lambda tree: Interpreter().interpret(tree),
+    # peach loops run in worker processes
+    "parallel": lambda tree: Interpreter(workers=2).interpret(tree),
+    "vm": lambda tree: VirtualMachine().interpret(tree),
+    "closure": lambda tree: ClosureInterpreter().interpret(tree),
+    "python": lambda tree: PythonInterpreter().interpret(tree),
+    "async": _run_async,
+}
+
+
+# parse and optimize the program, returns what running it on the engine printed
+def run(path, engine, optimize):
+    with open(path, "r") as file:
+        tree = Parser(Lexer(file.read()), os.path.dirname(path)).parse()
+    tree = Optimizer.for_level(optimize).optimize(tree)
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        ENGINES[engine](tree)
+    return stdout.getvalue()
+
+
+# the same programs must print the same on every engine and at every optimization level
+class EngineTest(unittest.TestCase):
+    def test_programs(self):
+        paths = sorted(glob.glob(os.path.join(PROGRAMS, "*.crt")))
+        self.assertTrue(paths)
+        for path in paths:
+            expected = run(path, "tree", 0)
+            self.assertTrue(expected)
+            for engine in ENGINES:
+                for optimize in LEVELS:
+                    with self.subTest(program=os.path.basename(path), engine=engine, optimize=optimize):
+                        self.assertEqual(run(path, engine, optimize), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import contextlib
+import io
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from incremental import IncrementalParser, split_statements
+from interpreter import Interpreter
+from parse import DefineFunction
+
+SOURCE = """func f(n) {
+    return n + 1
+}
+# comment of f
+func g(n) {
+    return n * 2
+}
+var x = 1
+if x > 0 {
+    println(g(f(x)))
+}
+else {
+    println(0)
+}
+"""
+
+
+class IncrementalTest(unittest.TestCase):
+    def test_split(self):
+        lines = [line for line, _ in split_statements(SOURCE)]
+        self.assertEqual(lines, [1, 5, 8, 9])
+
+    # only the statements whose text changed are parsed again, the others keep their nodes
+    def test_changed(self):
+        parser = IncrementalParser()
+        tree = parser.parse(SOURCE)
+        self.assertEqual(len(parser.changed), len(tree.children))
+
+        changed = parser.parse(SOURCE.replace("n * 2", "n * 3"))
+        self.assertEqual([type(node) for node in parser.changed], [DefineFunction])
+        self.assertEqual(parser.changed[0].name.text, "g")
+        self.assertIs(changed.children[0], tree.children[0])
+        self.assertIs(changed.children[2], tree.children[2])
+
+        parser.parse(SOURCE.replace("n * 2", "n * 3"))
+        self.assertEqual(parser.changed, [])
+
+    # statements below an added line are kept and move down
+    def test_moved(self):
+        parser = IncrementalParser()
+        tree = parser.parse(SOURCE)
+        moved = parser.parse("\n\n" + SOURCE)
+        self.assertEqual(parser.changed, [])
+        self.assertIs(moved.children[3], tree.children[3])
+        self.assertEqual(moved.children[3].line, 11)
+
+    # a failed parse keeps the statements of the last one
+    def test_error(self):
+        parser = IncrementalParser()
+        tree = parser.parse(SOURCE)
+        with self.assertRaises(Exception):
+            parser.parse(SOURCE.replace("var x = 1", "var x = y"))
+        parser.parse(SOURCE)
+        self.assertEqual(parser.changed, [])
+        self.assertIs(parser.parse(SOURCE).children[1], tree.children[1])
+
+    # a function reloaded by another thread is bound by the thread running the program
+    def test_reload(self):
+        parser = IncrementalParser()
+        tree = parser.parse("func f(n) {\n    return n + 1\n}\nvar a = f(1)\nwait()\nvar b = f(1)\nprintln(a, b)\n")
+        reloaded = parser.parse("func f(n) {\n    return n + 2\n}\nvar a = f(1)\nwait()\nvar b = f(1)\nprintln(a, b)\n")
+
+        def wait():
+            thread = threading.Thread(target=interpreter.reload_function, args=(parser.changed[0],))
+            thread.start()
+            thread.join()
+            # nothing changes before the program calls a function again
+            self.assertIs(interpreter.functions["f"], tree.children[0])
+
+        interpreter = Interpreter(builtins={"wait": wait})
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            interpreter.interpret(tree)
+        self.assertEqual(stdout.getvalue(), "2\n3\n")
+        self.assertIs(interpreter.functions["f"], reloaded.children[0])
+        self.assertEqual(interpreter.memos["f"].hits, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
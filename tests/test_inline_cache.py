@@ -0,0 +1,92 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from parse import Parser, CallFunction, CallMethod, walk
+from interpreter import Interpreter
+
+CALLS = """func f(n) {
+    return n + 1
+}
+var i = 0
+while i < 3 {
+    println(f(i))
+    change()
+    i++
+}
+"""
+
+# a method call site seeing receivers of different types
+METHODS = """var v = 0
+var i = 0
+while i < 4 {
+    v = item(i)
+    println(v.count("a"))
+    i++
+}
+"""
+
+
+class Counted:
+    def __init__(self):
+        self.count = lambda value: "own " + value
+
+
+def run(interpreter, tree):
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        interpreter.interpret(tree)
+    return stdout.getvalue()
+
+
+def call_sites(tree, name):
+    return [node for node in walk(tree) if isinstance(node, CallFunction) and node.name == name]
+
+
+class InlineCacheTest(unittest.TestCase):
+    def test_resolved_once(self):
+        tree = Parser(Lexer(CALLS)).parse()
+        interpreter = Interpreter(builtins={"change": lambda: None})
+        self.assertEqual(run(interpreter, tree), "1\n2\n3\n")
+        cache = call_sites(tree, "f")[0].cache
+        self.assertIs(cache[0], interpreter)
+        self.assertIs(cache[2], tree.children[0])
+
+    # rebinding a function invalidates the cached targets of all call sites
+    def test_rebound(self):
+        tree = Parser(Lexer(CALLS)).parse()
+        other = Parser(Lexer(CALLS.replace("n + 1", "n * 10"))).parse().children[0]
+        interpreter = Interpreter(builtins={"change": lambda: interpreter.reload_function(other)})
+        self.assertEqual(run(interpreter, tree), "1\n10\n20\n")
+        self.assertIs(call_sites(tree, "f")[0].cache[2], other)
+
+    # interpreters sharing a tree don't use each other's targets
+    def test_shared_tree(self):
+        tree = Parser(Lexer(CALLS)).parse()
+        self.assertEqual(run(Interpreter(builtins={"change": lambda: None}), tree), "1\n2\n3\n")
+        shadowing = Interpreter(builtins={"change": lambda: None, "f": lambda n: -n})
+        self.assertEqual(run(shadowing, tree), "0\n-1\n-2\n")
+        self.assertEqual(run(Interpreter(builtins={"change": lambda: None}), tree), "1\n2\n3\n")
+
+    def test_arguments(self):
+        tree = Parser(Lexer("func f(a, b) {\n    return a + b\n}\nprintln(f(1))\n")).parse()
+        with self.assertRaisesRegex(Exception, "Function f takes 2 arguments but 1 were given"):
+            run(Interpreter(), tree)
+
+    # methods are cached per receiver type, objects with a __dict__ can shadow them
+    def test_methods(self):
+        items = ["aab", ["a", "b"], Counted(), "a"]
+        tree = Parser(Lexer(METHODS)).parse()
+        output = run(Interpreter(builtins={"item": items.__getitem__}), tree)
+        self.assertEqual(output, "2\n1\nown a\n1\n")
+        site = next(node for node in walk(tree) if isinstance(node, CallMethod))
+        self.assertEqual(site.cache, (str, str.count))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from parse import Parser
+from interpreter import Interpreter
+
+FIB = """func fib(n) {
+    var result = n
+    if n > 1 {
+        result = fib(n - 1) + fib(n - 2)
+    }
+    return result
+}
+"""
+
+
+# runs the source on the tree walker, returns the interpreter and what it printed
+def run(source, **options):
+    interpreter = Interpreter(**options)
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        interpreter.interpret(Parser(Lexer(source)).parse())
+    return interpreter, stdout.getvalue()
+
+
+class MemoTest(unittest.TestCase):
+    def test_hits(self):
+        interpreter, output = run(FIB + "println(fib(30))\nprintln(fib(30))\n")
+        self.assertEqual(output, "832040\n832040\n")
+        memo = interpreter.memo_stats()["fib"]
+        # every n is computed once, fib(n - 2) hits for n >= 3 and so does the second call
+        self.assertEqual(memo.misses, 31)
+        self.assertEqual(memo.hits, 29)
+
+    def test_eviction(self):
+        source = "func square(n) {\n    return n * n\n}\n"
+        source += "println(square(1))\nprintln(square(2))\nprintln(square(3))\nprintln(square(1))\n"
+        interpreter, output = run(source, memo_size=2)
+        self.assertEqual(output, "1\n4\n9\n1\n")
+        memo = interpreter.memo_stats()["square"]
+        self.assertEqual((memo.hits, memo.misses), (0, 4))
+        self.assertEqual(list(memo.entries), [(3, int), (1, int)])
+
+    def test_disabled(self):
+        interpreter, output = run(FIB + "println(fib(10))\n", memo_size=0)
+        self.assertEqual(output, "55\n")
+        self.assertEqual(interpreter.memo_stats(), {})
+
+    def test_impure(self):
+        sources = {
+            "print": 'func f(n) {\n    print("called")\n    return n\n}\n',
+            "input": "func f(n) {\n    var line = input()\n    return n\n}\n",
+            "random": "func f(n) {\n    return n + rdm(0, 0)\n}\n",
+            "callee": "func g(n) {\n    println(n)\n    return n\n}\nfunc f(n) {\n    return g(n)\n}\n",
+            "nomemo": "nomemo func f(n) {\n    return n\n}\n",
+        }
+        for name, source in sources.items():
+            with self.subTest(name):
+                interpreter, _ = run(source + "var a = f(1)\nvar b = f(1)\n", builtins={"input": lambda: ""})
+                self.assertNotIn("f", interpreter.memo_stats())
+
+    # a host function shadowing a pure builtin is resolved first, like calls resolve it
+    def test_host_shadows_builtin(self):
+        calls = []
+        host = {"abs": lambda n: calls.append(n) or n}
+        interpreter, _ = run("func f(n) {\n    return abs(n)\n}\nvar a = f(1)\nvar b = f(1)\n", builtins=host)
+        self.assertEqual(calls, [1, 1])
+        self.assertNotIn("f", interpreter.memo_stats())
+
+    # memo forces memoization of a function that isn't provably pure
+    def test_forced(self):
+        interpreter, output = run('memo func f(n) {\n    println("called")\n    return n\n}\nvar a = f(1)\nvar b = f(1)\n')
+        self.assertEqual(output, "called\n")
+        self.assertEqual(interpreter.memo_stats()["f"].hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from parse import Parser, BinOp, walk
+from optimizer import Optimizer, IDENTITY
+
+
+def optimize(source, passes=(IDENTITY,)):
+    optimizer = Optimizer(passes)
+    tree = optimizer.optimize(Parser(Lexer(source)).parse())
+    return tree, optimizer
+
+
+class IdentityTest(unittest.TestCase):
+    def test_numbers(self):
+        tree, optimizer = optimize("var x = 4\nvar y = x + 0\nvar z = 1 * x\n")
+        self.assertEqual(optimizer.stats[IDENTITY], 2)
+        self.assertFalse([node for node in walk(tree) if isinstance(node, BinOp)])
+
+    # b * 1 is a copy of the array, dropping the operation would share it
+    def test_arrays(self):
+        tree, optimizer = optimize("var[] b = [1, 2]\nvar[] a = b * 1\nvar[] c = zeros(3) + 0\n")
+        self.assertEqual(optimizer.stats[IDENTITY], 0)
+        self.assertEqual(len([node for node in walk(tree) if isinstance(node, BinOp)]), 2)
+
+    def test_unknown(self):
+        _, optimizer = optimize("func f(v) {\n    return v * 1\n}\nprint(f(input()))\n")
+        self.assertEqual(optimizer.stats[IDENTITY], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import contextlib
+import glob
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from parse import Parser
+from interpreter import Interpreter
+
+PROGRAMS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "programs")
+
+
+def run(source, workers):
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        Interpreter(workers=workers).interpret(Parser(Lexer(source)).parse())
+    return stdout.getvalue()
+
+
+class PeachTest(unittest.TestCase):
+    # the output of a program must not depend on the number of workers
+    def test_workers(self):
+        for path in sorted(glob.glob(os.path.join(PROGRAMS, "peach*.crt"))):
+            with open(path, "r") as file:
+                source = file.read()
+            expected = run(source, 1)
+            for workers in (2, 4):
+                with self.subTest(program=os.path.basename(path), workers=workers):
+                    self.assertEqual(run(source, workers), expected)
+
+    def test_shared_writes(self):
+        programs = {
+            "assign": "var[] ys = [1, 2]\nvar s = 0\npeach y in ys {\n    s = y\n}\n",
+            "method": "var[] ys = [1, 2]\nvar[] l = []\npeach y in ys {\n    l.append(y)\n}\n",
+            "each": "var[] ys = [1, 2]\nvar[] xs = [9]\npeach y in ys {\n    each xs in ys {\n        print(xs)\n    }\n}\n",
+            "peach": "var[] ys = [1, 2]\nvar v = 0\npeach y in ys {\n    peach v in ys {\n        print(v)\n    }\n}\n",
+            "into": "var[] ys = [1, 2]\nvar[] r = []\npeach y in ys {\n    peach v in ys into r {\n        collect v\n    }\n}\n",
+        }
+        for name, source in programs.items():
+            with self.subTest(name), self.assertRaisesRegex(Exception, "The body of peach can't"):
+                Parser(Lexer(source)).parse()
+
+
+if __name__ == "__main__":
+    unittest.main()
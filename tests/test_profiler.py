@@ -0,0 +1,103 @@
+import contextlib
+import io
+import itertools
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from parse import Parser
+from profiler import ProfilingInterpreter, TOP_LEVEL
+
+SOURCE = """nomemo func leaf(n) {
+    return n + 1
+}
+nomemo func outer(n) {
+    var r = leaf(n)
+    return leaf(r)
+}
+nomemo func down(n) {
+    var r = 0
+    if n > 0 {
+        r = down(n - 1)
+    }
+    return r
+}
+var x = 0
+repeat 3 {
+    x = outer(x)
+}
+var y = down(20)
+println(x)
+"""
+
+
+# every reading of the clock advances it by a microsecond, so each timed line and function takes some time
+def profile(source, directory=None):
+    interpreter = ProfilingInterpreter()
+    interpreter.clock = itertools.count(0, 1000).__next__
+    with contextlib.redirect_stdout(io.StringIO()):
+        interpreter.interpret(Parser(Lexer(source), directory).parse())
+    return interpreter
+
+
+class ReportTest(unittest.TestCase):
+    def test_hits(self):
+        interpreter = profile(SOURCE)
+        hits = {line: timing.hits for (_, line), timing in interpreter.lines.items()}
+        self.assertEqual((hits[5], hits[16], hits[17], hits[19], hits[11]), (3, 1, 3, 1, 20))
+        calls = {name: timing.hits for name, timing in interpreter.function_timings.items()}
+        self.assertEqual(calls, {"leaf": 6, "outer": 3, "down": 21})
+
+    def test_functions(self):
+        interpreter = profile(SOURCE)
+        outer, leaf = interpreter.function_timings["outer"], interpreter.function_timings["leaf"]
+        self.assertLess(outer.own, outer.total)
+        self.assertEqual(leaf.own, leaf.total)
+        # recursive entries are counted once, the function doesn't take longer than the line calling it
+        self.assertLessEqual(interpreter.function_timings["down"].total, interpreter.lines[(None, 19)].total)
+
+    def test_report(self):
+        interpreter = profile(SOURCE)
+        report = interpreter.report(SOURCE.splitlines(), limit=3, path="main.crt").splitlines()
+        self.assertEqual(report[0].split(), ["file", "line", "hits", "total", "ms", "per", "hit", "us", "source"])
+        # the slowest lines first
+        totals = [float(line.split()[3]) for line in report[1:4]]
+        self.assertEqual(totals, sorted(totals, reverse=True))
+        self.assertEqual(report[4], "")
+        self.assertEqual(report[5].split(), ["function", "calls", "total", "ms", "own", "ms"])
+        self.assertEqual([line.split()[0] for line in report[6:]], ["down", "outer", "leaf"])
+        self.assertRegex(interpreter.report(SOURCE.splitlines(), path="main.crt"), r"main\.crt +17 +3 .* x = outer\(x\)")
+
+    def test_collapsed_stacks(self):
+        stacks = profile(SOURCE).collapsed_stacks().splitlines()
+        names = [line.rsplit(" ", 1)[0] for line in stacks]
+        self.assertIn(TOP_LEVEL, names)
+        self.assertIn(TOP_LEVEL + ";outer;leaf", names)
+        self.assertIn(TOP_LEVEL + ";down;down;down", names)
+        self.assertTrue(all(int(line.rsplit(" ", 1)[1]) > 0 for line in stacks))
+
+
+class ImportTest(unittest.TestCase):
+    # the lines of a module are counted apart from the lines of the program with the same number
+    def test_module_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, "lib"))
+            module = os.path.join(directory, "lib", "m.crt")
+            with open(module, "w") as file:
+                file.write("func twice(v) {\n    var r = v * 2\n    return r\n}\n")
+            source = 'import "lib/m.crt"\nvar x = 0\nrepeat 3 {\n    x = twice(x + 1)\n}\n'
+            interpreter = profile(source, directory)
+            self.assertEqual(interpreter.lines[(None, 2)].hits, 1)
+            self.assertEqual(interpreter.lines[(module, 2)].hits, 3)
+
+            report = interpreter.report(source.splitlines(), path=os.path.join(directory, "main.crt"))
+            self.assertRegex(report, r"main\.crt +2 +1 .* var x = 0")
+            self.assertRegex(report, r"lib/m\.crt +2 +3 .* var r = v \* 2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import scheduler
+
+ENDLESS = "var i = 0\nwhile i < 1 {\n    i = 0\n}\n"
+
+
+class SchedulerTest(unittest.TestCase):
+    # an endless tenant only gets its slices, the others finish and it is stopped by its budget
+    def test_budget(self):
+        runner = scheduler.Scheduler(slice_steps=100)
+        endless = runner.add("endless", ENDLESS, step_budget=10000)
+        short = runner.add("short", "var n = 0\nrepeat 500 {\n    n++\n}\nprint(n)\n")
+        slow = runner.add("slow", ENDLESS, cpu_budget=0.05)
+        runner.run()
+        self.assertEqual(short.status, scheduler.DONE)
+        self.assertEqual(short.stdout.getvalue(), "500\n")
+        self.assertEqual(endless.status, scheduler.OUT_OF_STEPS)
+        self.assertEqual(endless.steps, 10000)
+        self.assertEqual(slow.status, scheduler.OUT_OF_TIME)
+        # the short tenant needed a few slices, the endless one didn't get more in between
+        self.assertLessEqual(short.slices, 6)
+
+    def test_stdin(self):
+        runner = scheduler.Scheduler()
+        tenant = runner.add("ask", 'var name = input()\nprint("hi", name)\n', stdin="bob\n")
+        waiting = runner.add("waiting", "var name = input()\n")
+        runner.run()
+        self.assertEqual(tenant.stdout.getvalue(), "hi bob\n")
+        self.assertEqual(waiting.status, scheduler.FAILED)
+        self.assertIn("EOFError", waiting.error)
+
+    # tenants can't run python code, open files or reach the attributes of objects
+    def test_untrusted(self):
+        programs = {
+            "exec": 'exec("while True: pass")\n',
+            "eval": 'print(eval("1 + 1"))\n',
+            "open": 'print(open("/etc/passwd").read())\n',
+            "import": 'print(__import__("os").getcwd())\n',
+            "getattr": 'print(getattr(1, "real"))\n',
+            "private": 'var s = "x"\nprint(s.__class__())\n',
+        }
+        runner = scheduler.Scheduler()
+        tenants = {name: runner.add(name, source) for name, source in programs.items()}
+        fine = runner.add("fine", 'print(len("abc"), max(1, 2), str(3))\n')
+        runner.run()
+        for name, tenant in tenants.items():
+            with self.subTest(name):
+                self.assertEqual(tenant.status, scheduler.FAILED)
+                self.assertEqual(tenant.stdout.getvalue(), "")
+        self.assertEqual(fine.stdout.getvalue(), "3 2 3\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import io
+import os
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import client
+import serve
+
+
+# a daemon with one worker on a socket in a temporary directory, the scripts are written there as well
+class ServeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.socket = os.path.join(cls.directory.name, "daemon.sock")
+        cls.pool = serve.WorkerPool(1, timeout=2.0)
+        cls.server = serve.Server(cls.socket, cls.pool)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.pool.close()
+        cls.directory.cleanup()
+
+    def script(self, name, source):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file:
+            file.write(source)
+        return path
+
+    # returns the exit status, the output and the errors of the script
+    def run_script(self, path, stdin=""):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        status = client.run(self.socket, path, stdin, stdout, stderr)
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_output(self):
+        path = self.script("output.crt", "var[] xs = [1, 2]\neach x in xs {\n    println(x * 2)\n}\n")
+        self.assertEqual(self.run_script(path), (0, "2\n4\n", ""))
+
+    def test_stdin_and_prompt(self):
+        path = self.script("ask.crt", 'var name = input("name? ")\nprint("hello", name)\n')
+        self.assertEqual(self.run_script(path, "bob\n"), (0, "name? hello bob\n", ""))
+
+    def test_error(self):
+        path = self.script("error.crt", "print(undefined(1))\n")
+        status, stdout, stderr = self.run_script(path)
+        self.assertEqual(status, serve.STATUS_ERROR)
+        self.assertIn("undefined", stderr)
+
+    # exit() ends the script with its code and the worker keeps serving
+    def test_exit(self):
+        path = self.script("exit.crt", "print(1)\nexit(3)\nprint(2)\n")
+        recycled = self.pool.recycled
+        self.assertEqual(self.run_script(path), (3, "1\n", ""))
+        self.assertEqual(self.run_script(self.script("exit0.crt", "exit()\n")), (0, "", ""))
+        self.assertEqual(self.pool.recycled, recycled)
+
+    def test_timeout(self):
+        path = self.script("loop.crt", "var i = 0\nwhile i < 1 {\n    i = 0\n}\n")
+        status, _, stderr = self.run_script(path)
+        self.assertEqual(status, serve.STATUS_TIMEOUT)
+        self.assertIn("timed out", stderr)
+        # the killed worker is replaced
+        self.assertEqual(self.run_script(self.script("after_timeout.crt", "print(5)\n")), (0, "5\n", ""))
+
+    def test_crash(self):
+        self.pool.workers[0].process.kill()
+        status, _, stderr = self.run_script(self.script("crash.crt", "print(1)\n"))
+        self.assertEqual(status, serve.STATUS_ERROR)
+        self.assertIn("worker crashed", stderr)
+        self.assertEqual(self.run_script(self.script("after_crash.crt", "print(6)\n")), (0, "6\n", ""))
+
+    # a changed script is compiled again by the worker
+    def test_reload(self):
+        path = self.script("changed.crt", "print(1)\n")
+        self.assertEqual(self.run_script(path)[1], "1\n")
+        self.script("changed.crt", "print(2)\n")
+        os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1000000))
+        self.assertEqual(self.run_script(path)[1], "2\n")
+
+
+class FrameTest(unittest.TestCase):
+    def test_round_trip(self):
+        left, right = socket.socketpair()
+        with left, right:
+            client.send_frame(left, client.OUTPUT, b"text")
+            client.send_frame(left, client.EXIT, b"")
+            self.assertEqual(client.receive_frame(right), (client.OUTPUT, b"text"))
+            self.assertEqual(client.receive_frame(right), (client.EXIT, b""))
+            left.close()
+            with self.assertRaises(EOFError):
+                client.receive_frame(right)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from parse import Parser, AppendAssign, walk
+from interpreter import Interpreter
+from string_builder import StringBuilder, PIECES_PER_CHUNK
+
+
+def run(source, builtins=None):
+    interpreter = Interpreter(builtins=builtins)
+    tree = Parser(Lexer(source)).parse()
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        interpreter.interpret(tree)
+    return interpreter, tree, stdout.getvalue()
+
+
+class StringBuilderTest(unittest.TestCase):
+    def test_chunks(self):
+        builder = StringBuilder("start")
+        for index in range(PIECES_PER_CHUNK * 2 + 3):
+            builder.append(str(index % 10))
+        self.assertEqual(len(builder.chunks), 3)
+        self.assertEqual(len(builder.pieces), 3)
+        expected = "start" + "".join(str(index % 10) for index in range(PIECES_PER_CHUNK * 2 + 3))
+        self.assertEqual(str(builder), expected)
+        self.assertEqual(str(builder), expected)
+
+    # the variable holds a builder while it is appended to and a str once it is read
+    def test_variable(self):
+        seen = []
+
+        def peek():
+            seen.append(interpreter.global_frame[0].__class__)
+
+        source = 'var s = ""\nrepeat 1000 {\n    s += "ab"\n    s = s + "c"\n}\npeek()\nprintln(len(s))\npeek()\n'
+        interpreter = Interpreter(builtins={"peek": peek})
+        tree = Parser(Lexer(source)).parse()
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            interpreter.interpret(tree)
+        self.assertEqual(len([node for node in walk(tree) if isinstance(node, AppendAssign)]), 2)
+        self.assertEqual(seen, [StringBuilder, str])
+        self.assertEqual(stdout.getvalue(), "3000\n")
+        self.assertEqual(interpreter.globals["s"], "abc" * 1000)
+
+    # a read in the right side sees every append before it
+    def test_read_while_appending(self):
+        _, _, output = run('var s = "a"\nrepeat 3 {\n    s += s\n    s = s + str(len(s))\n}\nprintln(s)\n')
+        self.assertEqual(output, "aa2aa26aa2aa2614\n")
+
+    # prepending isn't an append, adding numbers is a plain addition
+    def test_other_values(self):
+        _, tree, output = run('var s = "b"\nvar n = 1\nrepeat 2 {\n    s = "a" + s\n    n += 2\n}\nprintln(s, n)\n')
+        self.assertEqual(output, "aab\n5\n")
+        self.assertEqual(len([node for node in walk(tree) if isinstance(node, AppendAssign)]), 1)
+        with self.assertRaises(TypeError):
+            run('var s = "a"\ns += "b"\ns += 1\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
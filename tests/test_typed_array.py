@@ -0,0 +1,57 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from typed_array import TypedArray, typed, zeros, ones, arange, rdmarray, CHOICES_LIMIT
+
+
+class TypedArrayTest(unittest.TestCase):
+    def test_operators(self):
+        xs = typed([1, 2, 4])
+        self.assertEqual((xs + 1).tolist(), [2.0, 3.0, 5.0])
+        self.assertEqual((1 - xs).tolist(), [0.0, -1.0, -3.0])
+        self.assertEqual((8 / xs).tolist(), [8.0, 4.0, 2.0])
+        self.assertEqual((xs * xs).tolist(), [1.0, 4.0, 16.0])
+        self.assertEqual((-xs).tolist(), [-1.0, -2.0, -4.0])
+        self.assertIs(+xs, xs)
+        with self.assertRaisesRegex(Exception, "different lengths: 3 and 2"):
+            xs + typed([1, 2])
+
+    def test_masks(self):
+        xs = arange(5)
+        self.assertEqual(xs.ge(3).tolist(), [0.0, 0.0, 0.0, 1.0, 1.0])
+        self.assertEqual(xs.select(xs.ne(2)).tolist(), [0.0, 1.0, 3.0, 4.0])
+        self.assertEqual(xs.select(1).tolist(), xs.tolist())
+        self.assertEqual(xs.select(0).tolist(), [])
+
+    def test_reductions(self):
+        xs = arange(2, 12, 3)
+        self.assertEqual(xs.tolist(), [2.0, 5.0, 8.0, 11.0])
+        self.assertEqual((xs.sum(), xs.min(), xs.max(), len(xs)), (26.0, 2.0, 11.0, 4))
+        self.assertEqual((sum(xs), min(xs), max(xs), list(xs)), (26.0, 2.0, 11.0, xs.tolist()))
+
+    def test_set(self):
+        xs = zeros(3)
+        xs.set(1.0, 5)
+        self.assertEqual((xs[1], repr(xs)), (5.0, "[0.0, 5.0, 0.0]"))
+        self.assertEqual((ones(2) + xs[1]).tolist(), [6.0, 6.0])
+        self.assertIsInstance(zeros(0), TypedArray)
+
+    # whole numbers between low and high which follow random.seed, for small and large spans
+    def test_rdmarray(self):
+        for low, high in ((1, 6), (-5, CHOICES_LIMIT * 4)):
+            with self.subTest(high=high):
+                random.seed(1)
+                values = rdmarray(1000, low, high)
+                random.seed(1)
+                self.assertEqual(rdmarray(1000, low, high).tolist(), values.tolist())
+                self.assertEqual(len(values), 1000)
+                self.assertTrue(all(low <= value <= high and value == int(value) for value in values))
+        self.assertEqual(set(rdmarray(1000, 1, 2)), {1.0, 2.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
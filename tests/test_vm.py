@@ -0,0 +1,102 @@
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lexer import Lexer
+from parse import Parser
+from compiler import Compiler, FRAME_BYTES, SLOT_BYTES
+from vm import VirtualMachine
+
+SERIES = """func series(n) {
+    var total = 0
+    if n > 0 {
+        total = n + series(n - 1)
+    }
+    return total
+}
+println(series(100000))
+"""
+
+# calls itself forever, only a step budget ends it
+ENDLESS = """func ping(n) {
+    return pong(n + 1)
+}
+func pong(n) {
+    return ping(n + 1)
+}
+var x = ping(0)
+"""
+
+
+def compile_source(source):
+    return Compiler().compile(Parser(Lexer(source)).parse())
+
+
+class TailCallTest(unittest.TestCase):
+    # recursion deeper than the python stack runs on the call stack of the vm
+    def test_deep_recursion(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            VirtualMachine().execute(compile_source(SERIES))
+        self.assertEqual(stdout.getvalue(), "5000050000\n")
+
+    def test_budget(self):
+        with self.assertRaisesRegex(Exception, "memory budget of 100000 bytes"):
+            VirtualMachine(memory_budget=100000).execute(compile_source(SERIES))
+
+    # tail calls replace the frame of the caller, the call stack doesn't grow
+    def test_tail_calls(self):
+        code_object = compile_source(ENDLESS)
+        self.assertIn("TAIL_CALL", code_object.consts[0].disassemble())
+        vm = VirtualMachine(memory_budget=FRAME_BYTES + 10 * SLOT_BYTES)
+        vm.start(code_object)
+        self.assertFalse(vm.run(200000))
+        _, _, _, _, frames, frame_memory = vm._state
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(frame_memory, code_object.consts[0].frame_bytes)
+
+    def test_not_in_tail_position(self):
+        code_object = compile_source(ENDLESS.replace("return pong(n + 1)", "return pong(n + 1) + 0"))
+        self.assertNotIn("TAIL_CALL", code_object.consts[0].disassemble())
+        vm = VirtualMachine(memory_budget=100000)
+        vm.start(code_object)
+        with self.assertRaisesRegex(Exception, "memory budget"):
+            vm.run(200000)
+
+
+class StepBudgetTest(unittest.TestCase):
+    # a program run in slices prints the same as one run through and counts every iteration and call
+    def test_slices(self):
+        code_object = compile_source(SERIES.replace("100000", "50") + "var i = 0\nwhile i < 30 {\n    i++\n}\nprintln(i)\n")
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            whole = VirtualMachine()
+            whole.execute(code_object)
+            vm = VirtualMachine()
+            vm.start(code_object)
+            slices = 1
+            while not vm.run(7):
+                self.assertEqual(vm.steps, 7 * slices)
+                slices += 1
+        self.assertEqual(stdout.getvalue(), "1275\n30\n" * 2)
+        self.assertEqual(vm.steps, whole.steps)
+        self.assertEqual(whole.steps, 51 + 30)
+        self.assertEqual(slices, -(-whole.steps // 7))
+        self.assertTrue(vm.finished)
+
+    # the result of the program is kept once it ends
+    def test_finished(self):
+        vm = VirtualMachine()
+        vm.start(compile_source("var x = 1\n"))
+        self.assertTrue(vm.run(1))
+        self.assertTrue(vm.finished)
+        self.assertIsNone(vm.result)
+        self.assertEqual(vm.steps, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
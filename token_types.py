@@ -18,8 +18,14 @@ class TokenType(enum.Enum):
     WHILE = "while"
     REPEAT = "repeat"
     EACH = "each"
+    PEACH = "peach"
+    INTO = "into"
+    COLLECT = "collect"
+    IMPORT = "import"
     IN = "in"
     RETURN = "return"
+    MEMO = "memo"
+    NOMEMO = "nomemo"
     # Operators.
     EQ = "="
     PLUS = "+"
@@ -0,0 +1,201 @@
+import builtins
+import keyword
+from token_types import TokenType
+from operators import COMPOUND_ASSIGN
+from interpreter import NodeVisitor
+from parse import CallFunction, CallMethod
+from custom_builtins import builtin_functions
+from modules import module_cache
+
+INDENT = "    "
+
+
+# Transpiler turning the AST of the parser into python source
+class Transpiler(NodeVisitor):
+    def __init__(self):
+        self.lines = []
+        self.level = 0
+        self.custom_builtins = set()
+        # lists the collect statements of the peach loops around the statement append to
+        self.peach_targets = []
+
+    def transpile(self, tree, filename="<program>"):
+        self.lines = []
+        self.level = 0
+        self.custom_builtins = set()
+        self.visit(tree)
+
+        header = ["# generated from " + filename + " by create.py"]
+        for name in sorted(self.custom_builtins):
+            header.append(self._custom_name(name) + " = _custom[" + repr(name) + "]")
+        return "\n".join(header + [""] + self.lines) + "\n"
+
+    def _emit(self, line):
+        self.lines.append(INDENT * self.level + line)
+
+    def _block(self, children):
+        self.level += 1
+        if not children:
+            self._emit("pass")
+        for child in children:
+            self._statement(child)
+        self.level -= 1
+
+    # calls used as statements only return their source
+    def _statement(self, node):
+        source = self.visit(node)
+        if isinstance(node, (CallFunction, CallMethod)):
+            self._emit(source)
+
+    # identifiers of the language only contain letters, so suffixes and prefixes can't clash
+    def _variable_name(self, name):
+        if keyword.iskeyword(name) or name in builtins.__dict__:
+            return name + "_"
+        return name
+
+    def _function_name(self, name):
+        return "fn_" + name
+
+    def _custom_name(self, name):
+        return "_" + name
+
+    # expressions return their source instead of emitting it
+    def _expression(self, node):
+        return self.visit(node)
+
+    def _arguments(self, parameters):
+        return ", ".join(self._expression(parameter) for parameter in parameters)
+
+    def visit_Program(self, node):
+        for child in node.children:
+            self._statement(child)
+
+    def visit_Num(self, node):
+        return repr(node.value)
+
+    def visit_String(self, node):
+        return repr(node.value)
+
+    def visit_Var(self, node):
+        return self._variable_name(node.value)
+
+    def visit_Array(self, node):
+        return "[" + self._arguments(node.children) + "]"
+
+    def visit_CallArray(self, node):
+        return self._variable_name(node.name) + "[int(" + self._expression(node.index) + ")]"
+
+    def visit_BinOp(self, node):
+        return "(" + self._expression(node.left) + " " + node.op.value + " " + self._expression(node.right) + ")"
+
+    def visit_UnaryOp(self, node):
+        return "(" + node.op.value + self._expression(node.expression) + ")"
+
+    def visit_CallFunction(self, node):
+        if node.name in builtins.__dict__:
+            name = node.name
+        elif node.name in builtin_functions:
+            self.custom_builtins.add(node.name)
+            name = self._custom_name(node.name)
+        else:
+            name = self._function_name(node.name)
+        return name + "(" + self._arguments(node.parameters) + ")"
+
+    def visit_CallMethod(self, node):
+        method = node.method_called
+        return self.visit(node.object_called) + "." + method.name + "(" + self._arguments(method.parameters) + ")"
+
+    def visit_Assign(self, node):
+        name = self._variable_name(node.left.value)
+        op = node.op
+        if op == TokenType.EQ:
+            value = self._expression(node.right)
+        elif op == TokenType.PLUSPLUS:
+            value = name + " + 1"
+        elif op == TokenType.MINUSMINUS:
+            value = name + " - 1"
+        else:
+            # not augmented, += would extend lists in place
+            value = name + " " + COMPOUND_ASSIGN[op].value + " " + self._expression(node.right)
+        self._emit(name + " = " + value)
+
+    def visit_Conditional(self, node):
+        prefix = "if "
+        for case in node.cases:
+            self._emit(prefix + self._expression(case.comparison) + ":")
+            self._block(case.children)
+            prefix = "elif "
+        if node.else_case is not None:
+            self._emit("else:")
+            self._block(node.else_case.children)
+
+    def visit_While(self, node):
+        self._emit("while " + self._expression(node.comparison) + ":")
+        self._block(node.children)
+
+    def visit_Repeat(self, node):
+        self._emit("for _ in range(int(" + self._expression(node.count) + ")):")
+        self._block(node.children)
+
+    def visit_Each(self, node):
+        name = self._variable_name(node.iterator.value)
+        self._emit("for " + name + " in " + self._expression(node.iterable) + ":")
+        self._block(node.children)
+        self._emit("del " + name)
+
+    # the iterations of peach run one after another, the values are collected
+    # into a list of their own because the target may be the iterated array
+    def visit_ParallelEach(self, node):
+        name = self._variable_name(node.iterator.value)
+        collected = "_collected" + str(len(self.peach_targets))
+        if node.target is not None:
+            self._emit(collected + " = []")
+        self._emit("for " + name + " in " + self._expression(node.iterable) + ":")
+        self.peach_targets.append(collected)
+        self._block(node.children)
+        self.peach_targets.pop()
+        if node.target is not None:
+            self._emit(self._variable_name(node.target.value) + " = " + collected)
+
+    def visit_Collect(self, node):
+        self._emit(self.peach_targets[-1] + ".append(" + self._expression(node.expression) + ")")
+
+    # the functions of the module are defined where it is imported
+    def visit_Import(self, node):
+        for func in module_cache.functions(node.path):
+            self.visit(func)
+
+    def visit_DefineFunction(self, node):
+        parameters = ", ".join(self._variable_name(parameter.text) for parameter in node.parameters)
+        if self.lines and self.lines[-1]:
+            self.lines.append("")
+        self._emit("def " + self._function_name(node.name.text) + "(" + parameters + "):")
+        self.level += 1
+        for child in node.children:
+            self._statement(child)
+        if node.return_statement is not None:
+            self._emit("return " + self._expression(node.return_statement))
+        elif not node.children:
+            self._emit("pass")
+        self.level -= 1
+        self.lines.append("")
+
+
+# Interpreter executing the transpiled python source
+class PythonInterpreter:
+    def __init__(self, parser=None, filename="<program>"):
+        self.parser = parser
+        self.filename = filename
+
+        self.globals = {"__name__": "__crt__", "_custom": builtin_functions}
+
+    # run the tree, parse it first if none is given
+    def interpret(self, tree=None):
+        if tree is None:
+            tree = self.parser.parse()
+        source = Transpiler().transpile(tree, self.filename)
+        return self.execute(source)
+
+    def execute(self, source):
+        code = compile(source, self.filename, "exec")
+        exec(code, self.globals)
@@ -0,0 +1,148 @@
+import operator
+import random
+from array import array
+from itertools import compress, repeat
+
+# every element is a C double, like the numbers of the language
+TYPECODE = "d"
+
+
+def _values(other, length):
+    if isinstance(other, TypedArray):
+        if len(other.data) != length:
+            raise Exception("Typed arrays have different lengths: {} and {}".format(length, len(other.data)))
+        return other.data
+    return repeat(float(other), length)
+
+
+# array of numbers, operators and methods work on all elements at once without interpreting a loop
+class TypedArray:
+    __slots__ = ("data",)
+
+    def __init__(self, data=()):
+        self.data = data if isinstance(data, array) else array(TYPECODE, data)
+
+    def _apply(self, function, other):
+        return TypedArray(array(TYPECODE, map(function, self.data, _values(other, len(self.data)))))
+
+    def _apply_reflected(self, function, other):
+        return TypedArray(array(TYPECODE, map(function, _values(other, len(self.data)), self.data)))
+
+    def __add__(self, other):
+        return self._apply(operator.add, other)
+
+    def __radd__(self, other):
+        return self._apply_reflected(operator.add, other)
+
+    def __sub__(self, other):
+        return self._apply(operator.sub, other)
+
+    def __rsub__(self, other):
+        return self._apply_reflected(operator.sub, other)
+
+    def __mul__(self, other):
+        return self._apply(operator.mul, other)
+
+    def __rmul__(self, other):
+        return self._apply_reflected(operator.mul, other)
+
+    def __truediv__(self, other):
+        return self._apply(operator.truediv, other)
+
+    def __rtruediv__(self, other):
+        return self._apply_reflected(operator.truediv, other)
+
+    def __neg__(self):
+        return TypedArray(array(TYPECODE, map(operator.neg, self.data)))
+
+    def __pos__(self):
+        return self
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __repr__(self):
+        return repr(self.data.tolist())
+
+    # comparisons only exist in if and while, so element-wise comparisons are methods
+    # returning a mask of 1.0 and 0.0
+    def eq(self, other):
+        return self._apply(operator.eq, other)
+
+    def ne(self, other):
+        return self._apply(operator.ne, other)
+
+    def lt(self, other):
+        return self._apply(operator.lt, other)
+
+    def le(self, other):
+        return self._apply(operator.le, other)
+
+    def gt(self, other):
+        return self._apply(operator.gt, other)
+
+    def ge(self, other):
+        return self._apply(operator.ge, other)
+
+    # elements whose mask value isn't 0
+    def select(self, mask):
+        return TypedArray(array(TYPECODE, compress(self.data, _values(mask, len(self.data)))))
+
+    def sum(self):
+        return sum(self.data)
+
+    def min(self):
+        return min(self.data)
+
+    def max(self):
+        return max(self.data)
+
+    def set(self, index, value):
+        self.data[int(index)] = value
+
+    def tolist(self):
+        return self.data.tolist()
+
+
+def typed(values):
+    return TypedArray(values)
+
+
+def zeros(n):
+    return TypedArray(array(TYPECODE, bytes(8 * int(n))))
+
+
+def ones(n):
+    return TypedArray(array(TYPECODE, [1.0]) * int(n))
+
+
+# python's range is a builtin and is called before the custom builtins
+def arange(start, stop=None, step=1):
+    if stop is None:
+        start, stop = 0, start
+    return TypedArray(array(TYPECODE, map(float, range(int(start), int(stop), int(step)))))
+
+
+# spans of rdmarray up to this size pick from a list of all values
+CHOICES_LIMIT = 1 << 16
+
+
+# n random whole numbers between low and high, like calling rdm n times
+def rdmarray(n, low, high):
+    n, low, high = int(n), int(low), int(high)
+    if high - low < CHOICES_LIMIT:
+        values = [float(value) for value in range(low, high + 1)]
+        return TypedArray(array(TYPECODE, random.choices(values, k=n)))
+
+    raw = array("I")
+    raw.frombytes(random.randbytes(raw.itemsize * n))
+    scale = (high - low + 1) / 2 ** (8 * raw.itemsize)
+    data = array(TYPECODE, map(operator.mul, raw, repeat(scale, n)))
+    data = array(TYPECODE, map(float, map(int, data)))
+    return TypedArray(data) + low
@@ -0,0 +1,18 @@
+class NodeVisitor:
+    def visit(self, node):
+        method_name = "visit_" + type(node).__name__
+        visitor = getattr(self, method_name, None)
+        if visitor is None:
+            visitor = self.fallback_visitor(node)
+        return visitor(node)
+
+    # specialized nodes are visited like their base class if there is no method for them
+    def fallback_visitor(self, node):
+        for cls in type(node).__mro__[1:]:
+            visitor = getattr(self, "visit_" + cls.__name__, None)
+            if visitor is not None:
+                return visitor
+        return self.generic_visit
+
+    def generic_visit(self, node):
+        raise Exception('No visit_{} method'.format(type(node).__name__))
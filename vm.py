@@ -0,0 +1,193 @@
+import builtins
+from compiler import *
+from custom_builtins import builtin_functions
+
+
+# the vm keeps its own call stack, so recursion depth is only limited by this budget
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+# Stack based virtual machine executing the bytecode of the compiler
+class VirtualMachine:
+    # python_builtins are the python functions programs can call, all of them if None
+    def __init__(self, parser=None, memory_budget=DEFAULT_MEMORY_BUDGET, python_builtins=None):
+        self.parser = parser
+        self.memory_budget = memory_budget
+        self.python_builtins = builtins.__dict__ if python_builtins is None else python_builtins
+
+        self.globals = {}
+        self.functions = {}
+
+        # loop iterations and calls executed, the unit of step budgets
+        self.steps = 0
+        self.finished = True
+        self.result = None
+        # (code object, pc, scope, stack, frames of the callers, frame memory) of a started program
+        self._state = None
+
+    # run the tree, parse it first if none is given
+    def interpret(self, tree=None):
+        if tree is None:
+            tree = self.parser.parse()
+        code_object = Compiler().compile(tree)
+        return self.execute(code_object)
+
+    def _resolve(self, name):
+        if name in self.python_builtins:
+            return self.python_builtins[name]
+        elif name in builtin_functions:
+            return builtin_functions[name]
+        return None
+
+    def execute(self, code_object):
+        self.start(code_object)
+        self.run()
+        return self.result
+
+    # prepare running a code object in slices with run
+    def start(self, code_object):
+        self._state = (code_object, 0, self.globals, [], [], 0)
+        self.finished = False
+        self.result = None
+
+    # continue the started program until it ends or steps loop iterations and calls are done,
+    # returns whether it ended, the result is kept in self.result
+    def run(self, steps=None):
+        functions = self.functions
+        global_scope = self.globals
+        binary_operators = BINARY_OPERATORS
+        unary_operators = UNARY_OPERATORS
+
+        # frames holds the saved (code object, pc, scope) of the callers
+        code_object, pc, scope, stack, frames, frame_memory = self._state
+        memory_budget = self.memory_budget
+        push = stack.append
+        pop = stack.pop
+
+        code = code_object.code
+        consts = code_object.consts
+        names = code_object.names
+
+        # counts down to 0, without a limit it starts below 0 and never gets there
+        limit = -1 if steps is None else steps
+        remaining = limit
+        try:
+            while True:
+                op = code[pc]
+                arg = code[pc + 1]
+                pc += 2
+
+                if op == LOAD_NAME:
+                    push(scope[names[arg]])
+                elif op == LOAD_CONST:
+                    push(consts[arg])
+                elif op == STORE_NAME:
+                    scope[names[arg]] = pop()
+                elif op == BINARY_OP:
+                    right = pop()
+                    if arg == 0:
+                        stack[-1] = stack[-1] + right
+                    else:
+                        stack[-1] = binary_operators[arg](stack[-1], right)
+                elif op == POP_JUMP_IF_FALSE:
+                    if not pop():
+                        pc = arg
+                elif op == JUMP:
+                    pc = arg
+                    # every loop iteration ends with a jump back
+                    remaining -= 1
+                    if not remaining:
+                        return False
+                elif op == JUMP_FORWARD:
+                    pc = arg
+                elif op == FOR_ITER:
+                    for value in stack[-1]:
+                        push(value)
+                        break
+                    else:
+                        pop()
+                        pc = arg
+                elif op == FOR_REPEAT:
+                    for value in stack[-1]:
+                        break
+                    else:
+                        pop()
+                        pc = arg
+                elif op == POP_TOP:
+                    pop()
+                elif op == CALL_FUNCTION or op == TAIL_CALL:
+                    name, count = code_object.calls[arg]
+                    if count:
+                        arguments = stack[-count:]
+                        del stack[-count:]
+                    else:
+                        arguments = []
+
+                    function = self._resolve(name)
+                    if function is not None:
+                        push(function(*arguments))
+                        continue
+
+                    function = functions[name]
+                    if count < len(function.parameters):
+                        raise Exception("Function " + name + " expects " + str(len(function.parameters)) + " arguments")
+                    if op == CALL_FUNCTION:
+                        frames.append((code_object, pc, scope))
+                        frame_memory += function.frame_bytes
+                        if frame_memory > memory_budget:
+                            raise Exception("Call stack exceeded memory budget of " + str(memory_budget) + " bytes")
+                    else:
+                        # tail call, the frame of the returning function is reused
+                        frame_memory += function.frame_bytes - code_object.frame_bytes
+                    code_object = function
+                    code = code_object.code
+                    consts = code_object.consts
+                    names = code_object.names
+                    scope = dict(zip(function.parameters, arguments))
+                    pc = 0
+                    remaining -= 1
+                    if not remaining:
+                        return False
+                elif op == CALL_METHOD:
+                    name, count = code_object.calls[arg]
+                    if count:
+                        arguments = stack[-count:]
+                        del stack[-count:]
+                    else:
+                        arguments = []
+                    stack[-1] = getattr(stack[-1], name)(*arguments)
+                elif op == LOAD_INDEX:
+                    stack[-1] = global_scope[names[arg]][int(stack[-1])]
+                elif op == UNARY_OP:
+                    stack[-1] = unary_operators[arg](stack[-1])
+                elif op == GET_ITER:
+                    stack[-1] = iter(stack[-1])
+                elif op == GET_RANGE:
+                    stack[-1] = iter(range(int(stack[-1])))
+                elif op == DELETE_NAME:
+                    del scope[names[arg]]
+                elif op == BUILD_LIST:
+                    if arg:
+                        values = stack[-arg:]
+                        del stack[-arg:]
+                    else:
+                        values = []
+                    push(values)
+                elif op == DEFINE_FUNCTION:
+                    function = consts[arg]
+                    functions[function.name] = function
+                elif op == RETURN_VALUE:
+                    if not frames:
+                        self.result = pop()
+                        self.finished = True
+                        return True
+                    frame_memory -= code_object.frame_bytes
+                    code_object, pc, scope = frames.pop()
+                    code = code_object.code
+                    consts = code_object.consts
+                    names = code_object.names
+                else:
+                    raise Exception("Unknown opcode: " + str(op))
+        finally:
+            self.steps += limit - remaining
+            self._state = (code_object, pc, scope, stack, frames, frame_memory)